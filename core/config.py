@@ -57,6 +57,7 @@ TWITTER_TWEET_MAX: int = int(os.getenv("TWITTER_TWEET_MAX", "280"))
 MASTODON_POST_MAX: int = int(os.getenv("MASTODON_POST_MAX", "500"))
 BLUESKY_POST_MAX: int = int(os.getenv("BLUESKY_POST_MAX", "300"))
 DISCORD_SEND_DELAY_SECONDS: float = float(os.getenv("DISCORD_SEND_DELAY_SECONDS", "0.2"))
+DISCORD_SEND_CONCURRENCY: int = int(os.getenv("DISCORD_SEND_CONCURRENCY", "5"))
 ARTICLE_PUBLISH_DELAY_SECONDS: float = float(os.getenv("ARTICLE_PUBLISH_DELAY_SECONDS", "30"))
 SENT_RING_MAX: int = int(os.getenv("SENT_RING_MAX", "250"))
 
@@ -143,10 +144,10 @@ def load_targets() -> dict:
         return {"enabled": ["discord", "telegram"], "discord": {}, "telegram": {}}
 
 
-def load_discord_channels_map() -> dict:
-    """Load discord_channels.json mapping guild_id -> channel_id."""
-    if not os.path.exists(DISCORD_CHANNELS_FILE):
-        return {}
+_channels_cache = None  # ((mtime_ns, size), parsed map)
+
+
+def _read_discord_channels_file() -> dict:
     try:
         with open(DISCORD_CHANNELS_FILE, "r", encoding="utf-8") as f:
             data = json.load(f)
@@ -165,12 +166,32 @@ def load_discord_channels_map() -> dict:
         return {}
 
 
+def load_discord_channels_map() -> dict:
+    """Load discord_channels.json mapping guild_id -> channel_id.
+
+    The parsed map is kept in memory and only re-read when the file's mtime or
+    size changes. Returns a copy, callers may mutate it.
+    """
+    global _channels_cache
+    try:
+        st = os.stat(DISCORD_CHANNELS_FILE)
+    except OSError:
+        return {}
+    key = (st.st_mtime_ns, st.st_size)
+    if _channels_cache is None or _channels_cache[0] != key:
+        _channels_cache = (key, _read_discord_channels_file())
+    return dict(_channels_cache[1])
+
+
 def save_discord_channels_map(channels_map: dict) -> None:
     """Atomic write of discord_channels.json."""
+    global _channels_cache
     tmp = f"{DISCORD_CHANNELS_FILE}.tmp"
     with open(tmp, "w", encoding="utf-8") as f:
         json.dump(channels_map, f, ensure_ascii=False, indent=2)
     os.replace(tmp, DISCORD_CHANNELS_FILE)
+    # A same-size rewrite within the mtime granularity would keep the old key
+    _channels_cache = None
 
 
 def get_all_discord_target_channel_ids() -> list[int]:
@@ -0,0 +1,96 @@
+"""Shared aiohttp session for outbound HTTP (RSS, images, Telegram, Mastodon).
+
+A single process-wide ClientSession keeps TCP/TLS connections and DNS lookups
+pooled across articles and publishers instead of reconnecting on every call.
+"""
+
+import logging
+from typing import Mapping, Optional, Tuple
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+log = logging.getLogger("bergfrid.http")
+
+USER_AGENT = "Bergfrid-Bot/1.0"
+MAX_IMAGE_BYTES = 5_000_000
+# Sources that shrink_image re-encodes before upload may start out larger
+MAX_SOURCE_IMAGE_BYTES = 20_000_000
+_FEED_ACCEPT = "application/rss+xml, application/atom+xml, application/xml;q=0.9, */*;q=0.5"
+# Some CDNs serve images untyped; let the decoder decide for those
+_IMAGE_TYPES_OK = ("image/", "application/octet-stream")
+
+_session = None
+
+
+async def get_session():
+    """Return the shared ClientSession (created lazily), or None without aiohttp."""
+    global _session
+    if aiohttp is None:
+        log.error("aiohttp non installe, HTTP async indisponible.")
+        return None
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=20),
+            connector=aiohttp.TCPConnector(
+                limit=32, limit_per_host=8, ttl_dns_cache=300, keepalive_timeout=75,
+            ),
+            headers={"User-Agent": USER_AGENT},
+        )
+    return _session
+
+
+async def fetch_image(url: str, max_bytes: int = MAX_IMAGE_BYTES) -> Tuple[bytes, str]:
+    """GET an image, bailing out on the headers before buffering a bad body.
+
+    Rejects non-image Content-Types and a Content-Length above max_bytes, and
+    stops reading once max_bytes is exceeded when the length isn't announced.
+    Raises on HTTP/network errors and ValueError on rejected responses.
+    """
+    sess = await get_session()
+    if sess is None:
+        raise RuntimeError("aiohttp non installe")
+    async with sess.get(url) as resp:
+        resp.raise_for_status()
+        content_type = resp.headers.get("Content-Type", "")
+        if content_type and not content_type.startswith(_IMAGE_TYPES_OK):
+            raise ValueError(f"pas une image ({content_type})")
+        if resp.content_length is not None and resp.content_length > max_bytes:
+            raise ValueError(f"image trop grosse ({resp.content_length // 1024} KB)")
+        buf = bytearray()
+        async for chunk in resp.content.iter_chunked(64 * 1024):
+            buf += chunk
+            if len(buf) > max_bytes:
+                raise ValueError(f"image trop grosse (> {max_bytes // 1024} KB)")
+        return bytes(buf), content_type
+
+
+async def fetch_feed(url: str, etag: Optional[str] = None, modified: Optional[str] = None,
+                     timeout: float = 30) -> Tuple[int, bytes, Mapping[str, str]]:
+    """Conditional GET for a feed: returns (status, body, headers).
+
+    Sends If-None-Match/If-Modified-Since from the cached validators; a 304
+    comes back with an empty body. Raises on network errors and non-2xx.
+    """
+    sess = await get_session()
+    if sess is None:
+        raise RuntimeError("aiohttp non installe")
+    headers = {"Accept": _FEED_ACCEPT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+    async with sess.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        if resp.status == 304:
+            return 304, b"", resp.headers
+        resp.raise_for_status()
+        return resp.status, await resp.read(), resp.headers
+
+
+async def close_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,53 @@
+"""Short-lived in-process cache of downloaded article images.
+
+Bluesky and Mastodon publish the same article concurrently; both ask for the
+same image_url within milliseconds. Concurrent callers share one in-flight
+download, and the bytes are kept for IMAGE_CACHE_TTL so retries on the next
+tick don't download again.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Tuple
+
+from core.http import MAX_IMAGE_BYTES, fetch_image
+
+log = logging.getLogger("bergfrid.image_cache")
+
+IMAGE_CACHE_TTL = 3600.0
+IMAGE_CACHE_MAX = 16  # usually a few hundred KB each, at most MAX_SOURCE_IMAGE_BYTES
+
+_cache: Dict[str, Tuple[float, bytes, str]] = {}
+_inflight: Dict[Tuple[str, int], "asyncio.Task"] = {}
+
+
+async def get_bytes(url: str, max_bytes: int = MAX_IMAGE_BYTES) -> Tuple[bytes, str]:
+    """Return (body, content_type) for url, downloading at most once per TTL.
+
+    max_bytes is the caller's download cap (see fetch_image); a cached body
+    is only reused if it fits it.
+    """
+    hit = _cache.get(url)
+    if (hit is not None and time.monotonic() - hit[0] < IMAGE_CACHE_TTL
+            and len(hit[1]) <= max_bytes):
+        return hit[1], hit[2]
+
+    key = (url, max_bytes)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch_image(url, max_bytes))
+        _inflight[key] = task
+        task.add_done_callback(lambda _t: _inflight.pop(key, None))
+    # shield: one caller being cancelled must not cancel the shared download
+    data, content_type = await asyncio.shield(task)
+
+    _cache.pop(url, None)
+    _cache[url] = (time.monotonic(), data, content_type)
+    while len(_cache) > IMAGE_CACHE_MAX:
+        _cache.pop(next(iter(_cache)))
+    return data, content_type
+
+
+def clear() -> None:
+    _cache.clear()
@@ -0,0 +1,64 @@
+"""Image downscaling/re-encoding before upload to social platforms."""
+
+import io
+import logging
+from typing import Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+log = logging.getLogger("bergfrid.images")
+
+_QUALITY_STEPS = (70, 55, 40)
+
+
+def shrink_image(data: bytes, max_dim: int, max_bytes: int = 0,
+                 quality: int = 80) -> Tuple[bytes, Optional[str]]:
+    """Downscale to max_dim (long edge) and re-encode as JPEG.
+
+    When max_bytes is set, quality is lowered step by step until the result
+    fits. Returns (data, content_type); content_type is None when the original
+    bytes are returned untouched (Pillow missing, undecodable or animated
+    image, or re-encoding would not make it smaller). CPU-bound: call via
+    asyncio.to_thread.
+    """
+    if Image is None:
+        log.warning("Pillow non installe, image envoyee sans compression.")
+        return data, None
+
+    fits = not max_bytes or len(data) <= max_bytes
+    try:
+        img = Image.open(io.BytesIO(data))
+        if getattr(img, "is_animated", False) and fits:
+            return data, None
+        img.draft("RGB", (max_dim, max_dim))  # JPEG: decode at reduced scale
+        if max(img.size) > max_dim:
+            img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+        if img.mode in ("RGBA", "LA", "P"):
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+    except Exception as e:
+        log.warning("Image illisible (%s), envoyee telle quelle.", e)
+        return data, None
+
+    for q in (quality,) + tuple(s for s in _QUALITY_STEPS if s < quality):
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=q, optimize=True)
+        result = buf.getvalue()
+        if not max_bytes or len(result) <= max_bytes:
+            break
+    else:
+        log.warning("Image toujours trop grosse apres compression (%d KB).", len(result) // 1024)
+
+    if fits and len(result) >= len(data):
+        return data, None
+    log.info(
+        "Image compressee: %d KB -> %d KB (%dx%d, q=%d)",
+        len(data) // 1024, len(result) // 1024, img.size[0], img.size[1], q,
+    )
+    return result, "image/jpeg"
@@ -1,24 +1,38 @@
 import asyncio
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
-from urllib.parse import urljoin
-
 import re
+from itertools import takewhile
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
 
 import feedparser
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from core.http import fetch_feed
 from core.models import Article
 from core.utils import strip_html_to_text, extract_tags_from_terms
 
 log = logging.getLogger("bergfrid.rss")
 
+_TRAILING_HASHTAGS_RE = re.compile(r"(\s*#\w+)+\s*$")
+_ID_ATTRS = ("id", "guid", "link")
+_AUTHOR_ATTRS = ("author", "dc_creator")
+
+
+def _first_attr(entry: Any, names: Tuple[str, ...]) -> Any:
+    """First truthy attribute among names, else None."""
+    return next(filter(None, (getattr(entry, n, None) for n in names)), None)
+
 
 def _entry_id(entry: Any) -> str:
-    for attr in ("id", "guid", "link"):
-        v = getattr(entry, attr, None)
-        if v:
-            return str(v)
+    v = _first_attr(entry, _ID_ATTRS)
+    if v:
+        return str(v)
     return str(getattr(entry, "title", "unknown"))
 
 
@@ -32,48 +46,71 @@ def _entry_html(entry: Any) -> str:
 
 
 def _author(entry: Any) -> str:
-    a = getattr(entry, "author", None)
+    a = _first_attr(entry, _AUTHOR_ATTRS)
     if a:
         return str(a).strip()
-    dc = getattr(entry, "dc_creator", None)
-    if dc:
-        return str(dc).strip()
     return "Redaction"
 
 
-def _category(entry: Any) -> str:
+def _tag_terms(entry: Any) -> List[str]:
+    terms = []
+    for t in getattr(entry, "tags", None) or ():
+        term = getattr(t, "term", None)
+        if term:
+            terms.append(str(term))
+    return terms
+
+
+def _category(entry: Any, terms: Optional[List[str]] = None) -> str:
     c = getattr(entry, "category", None)
     if c:
         return str(c).strip()
-    tags = getattr(entry, "tags", None) or []
-    if tags:
-        term = getattr(tags[0], "term", None)
-        if term:
-            return str(term).strip()
+    if terms is None:
+        terms = _tag_terms(entry)
+    return terms[0].strip() if terms else ""
+
+
+def _from_media_content(entry: Any) -> str:
+    mc = getattr(entry, "media_content", None)
+    if not isinstance(mc, list):
+        return ""
+    for m in mc:
+        url = m.get("url", "")
+        if url:
+            return url
+    return ""
+
+
+def _from_media_thumbnail(entry: Any) -> str:
+    mt = getattr(entry, "media_thumbnail", None)
+    if not isinstance(mt, list):
+        return ""
+    for m in mt:
+        url = m.get("url", "")
+        if url:
+            return url
     return ""
 
 
+def _from_enclosure(entry: Any) -> str:
+    enc = getattr(entry, "enclosures", None)
+    if not isinstance(enc, list):
+        return ""
+    for e in enc:
+        url = e.get("href", "") or e.get("url", "")
+        if url and "image" in e.get("type", ""):
+            return url
+    return ""
+
+
+# Tried in order; the first non-empty URL wins
+_IMG_EXTRACTORS = (_from_media_content, _from_media_thumbnail, _from_enclosure)
+
+
 def _image_url(entry: Any, base_domain: str) -> str:
     """Extract article image URL from media:content, media:thumbnail, or enclosure."""
-    mc = getattr(entry, "media_content", None) or []
-    if mc and isinstance(mc, list):
-        for m in mc:
-            url = m.get("url", "")
-            if url:
-                return urljoin(base_domain, url)
-    mt = getattr(entry, "media_thumbnail", None) or []
-    if mt and isinstance(mt, list):
-        for m in mt:
-            url = m.get("url", "")
-            if url:
-                return urljoin(base_domain, url)
-    enc = getattr(entry, "enclosures", None) or []
-    if enc and isinstance(enc, list):
-        for e in enc:
-            url = e.get("href", "") or e.get("url", "")
-            if url and "image" in e.get("type", ""):
-                return urljoin(base_domain, url)
-    return ""
+    url = next((u for u in (ex(entry) for ex in _IMG_EXTRACTORS) if u), "")
+    return urljoin(base_domain, url) if url else ""
 
 
 def _published_dt(entry: Any) -> Optional[datetime]:
@@ -88,16 +125,37 @@ def _published_dt(entry: Any) -> Optional[datetime]:
 
 
 def _parse_rss_sync(url: str, etag: Optional[str], modified: Optional[str]) -> Any:
-    """Synchronous RSS parse (called via asyncio.to_thread)."""
+    """Synchronous RSS fetch+parse (fallback when aiohttp is missing)."""
     return feedparser.parse(url, etag=etag, modified=modified)
 
 
+async def _fetch_and_parse(url: str, etag: Optional[str], modified: Optional[str],
+                           timeout: float) -> Any:
+    """Fetch over the shared session, parse the bytes in a worker thread."""
+    if aiohttp is None:
+        return await asyncio.to_thread(_parse_rss_sync, url, etag, modified)
+    status, body, headers = await fetch_feed(url, etag, modified, timeout=timeout)
+    if status == 304:
+        feed = feedparser.FeedParserDict(entries=[])
+    else:
+        feed = await asyncio.to_thread(
+            feedparser.parse, body,
+            response_headers={"content-type": headers.get("Content-Type", "")},
+        )
+    feed["status"] = status
+    if headers.get("ETag"):
+        feed["etag"] = headers["ETag"]
+    if headers.get("Last-Modified"):
+        feed["modified"] = headers["Last-Modified"]
+    return feed
+
+
 async def parse_rss_with_cache(url: str, base_domain: str, state: Dict[str, Any],
                                 timeout: float = 30) -> Any:
-    """Async RSS fetch with timeout. Runs feedparser in a thread pool."""
+    """Async conditional RSS fetch with timeout; parsing runs in a thread."""
     try:
         feed = await asyncio.wait_for(
-            asyncio.to_thread(_parse_rss_sync, url, state.get("etag"), state.get("modified")),
+            _fetch_and_parse(url, state.get("etag"), state.get("modified"), timeout),
             timeout=timeout,
         )
     except asyncio.TimeoutError:
@@ -107,12 +165,16 @@ async def parse_rss_with_cache(url: str, base_domain: str, state: Dict[str, Any]
         log.error("Erreur fetch RSS: %s", e)
         return feedparser.parse("")
 
+    status = getattr(feed, "status", None)
+    if status == 304:
+        log.debug("RSS inchange (304 Not Modified).")
+        return feed
+
     if getattr(feed, "etag", None):
         state["etag"] = feed.etag
     if getattr(feed, "modified", None):
         state["modified"] = feed.modified
 
-    status = getattr(feed, "status", None)
     entries = getattr(feed, "entries", None) or []
     log.debug("RSS fetch status=%s, entries=%d", status, len(entries))
 
@@ -121,13 +183,7 @@ async def parse_rss_with_cache(url: str, base_domain: str, state: Dict[str, Any]
 
 def feed_to_backlog(feed: Any, last_seen: str) -> List[Any]:
     entries = getattr(feed, "entries", None) or []
-    backlog = []
-    for e in entries:
-        eid = _entry_id(e)
-        if eid == last_seen:
-            break
-        backlog.append(e)
-    return backlog
+    return list(takewhile(lambda e: _entry_id(e) != last_seen, entries))
 
 
 def entry_to_article(entry: Any, base_domain: str) -> Article:
@@ -139,12 +195,7 @@ def entry_to_article(entry: Any, base_domain: str) -> Article:
     raw_html = _entry_html(entry)
     summary = strip_html_to_text(raw_html)
 
-    raw_terms = []
-    for t in (getattr(entry, "tags", None) or []):
-        term = getattr(t, "term", None)
-        if term:
-            raw_terms.append(str(term))
-
+    raw_terms = _tag_terms(entry)  # shared by tags and the category fallback
     tags = extract_tags_from_terms(raw_terms)
 
     # social_summary: custom field > description (short) > empty
@@ -155,7 +206,7 @@ def entry_to_article(entry: Any, base_domain: str) -> Article:
             social_raw = desc
     social_summary = strip_html_to_text(social_raw).strip() if social_raw else ""
     # Strip trailing hashtag block from description fallback (avoid duplication with tags)
-    social_summary = re.sub(r'(\s*#\w+)+\s*$', '', social_summary).strip()
+    social_summary = _TRAILING_HASHTAGS_RE.sub("", social_summary).strip()
 
     return Article(
         id=eid,
@@ -164,7 +215,7 @@ def entry_to_article(entry: Any, base_domain: str) -> Article:
         summary=summary,
         tags=tags,
         author=_author(entry),
-        category=_category(entry),
+        category=_category(entry, raw_terms),
         published_at=_published_dt(entry),
         social_summary=social_summary,
         image_url=_image_url(entry, base_domain),
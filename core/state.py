@@ -1,18 +1,99 @@
 import os
 import json
 import logging
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 log = logging.getLogger("bergfrid.state")
 
 
+def _read_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        raw = f.read()
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, SentRing):
+        return obj.to_list()
+    raise TypeError(f"Type non serialisable: {type(obj).__name__}")
+
+
 def _atomic_write_json(path: str, data: Dict[str, Any]) -> None:
+    if orjson is not None:
+        payload = orjson.dumps(data, default=_json_default, option=orjson.OPT_INDENT_2)
+    else:
+        payload = json.dumps(
+            data, default=_json_default, ensure_ascii=False, indent=2
+        ).encode("utf-8")
     tmp = f"{path}.tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(tmp, "wb") as f:
+        f.write(payload)
     os.replace(tmp, path)
 
 
+def _plain_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of state with the sent rings as lists (for the Gist's json.dumps)."""
+    sent = state.get("sent", {})
+    return {**state, "sent": {k: list(v) for k, v in sent.items()}}
+
+
+class SentRing:
+    """Ring of sent ids with a set index for O(1) membership.
+
+    Wraps its list rather than subclassing it so nothing can bypass the
+    index: add() and trim() are the only mutators. Serialized as a list.
+    """
+    __slots__ = ("_ids", "_index")
+
+    def __init__(self, ids: Iterable[Any] = ()):
+        # Dedupe, keep order; drop anything a corrupted file put there
+        self._ids = list(dict.fromkeys(i for i in ids if isinstance(i, str)))
+        self._index = set(self._ids)
+
+    def __contains__(self, entry_id: object) -> bool:
+        return entry_id in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, SentRing):
+            return self._ids == other._ids
+        if isinstance(other, list):
+            return self._ids == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"SentRing({self._ids!r})"
+
+    def to_list(self) -> List[str]:
+        return list(self._ids)
+
+    def add(self, entry_id: str, max_len: int) -> None:
+        if entry_id not in self._index:
+            self._ids.append(entry_id)
+            self._index.add(entry_id)
+        self.trim(max_len)
+
+    def trim(self, max_len: int) -> None:
+        extra = len(self._ids) - max_len
+        if extra > 0:
+            self._index.difference_update(self._ids[:extra])
+            del self._ids[:extra]
+
+
 def _init_gist_sync() -> Optional[Any]:
     """Create GistSync if env vars are set, else None."""
     token = os.environ.get("GITHUB_GIST_TOKEN", "")
@@ -42,36 +123,43 @@ class StateStore:
         if self._gist:
             log.info("Gist sync: ACTIVE (gist_id=%s).", self._gist.gist_id)
         self._save_counter = 0
+        self._last_write = 0.0
+        self._pending: Optional[Dict[str, Any]] = None
 
     def _empty_state(self) -> Dict[str, Any]:
         return {
             "last_id": None,
             "etag": None,
             "modified": None,
-            "sent": {p: [] for p in self.PLATFORMS},
+            "sent": {p: SentRing() for p in self.PLATFORMS},
         }
 
     def _normalize(self, data: Dict[str, Any]) -> Dict[str, Any]:
         data.setdefault("last_id", None)
         data.setdefault("etag", None)
         data.setdefault("modified", None)
-        data.setdefault("sent", {})
+        sent = data.get("sent")
+        if not isinstance(sent, dict):
+            sent = data["sent"] = {}
         for p in self.PLATFORMS:
-            data["sent"].setdefault(p, [])
+            sent.setdefault(p, [])
+        for p, ids in sent.items():
+            if not isinstance(ids, SentRing):
+                sent[p] = SentRing(ids if isinstance(ids, list) else ())
         return data
 
     def load(self) -> Dict[str, Any]:
+        self.flush()
         # Try local file first
         if os.path.exists(self.path):
             try:
-                with open(self.path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                data = _read_json(self.path)
                 if not isinstance(data, dict):
                     raise ValueError("state n'est pas un dict")
                 return self._normalize(data)
             except json.JSONDecodeError as e:
                 log.error("State local corrompu: %s", e)
-            except (OSError, ValueError) as e:
+            except (OSError, ValueError, TypeError) as e:
                 log.error("Erreur lecture state local: %s", e)
 
         # Local missing/corrupt -> try Gist
@@ -94,9 +182,13 @@ class StateStore:
         sent = state.get("sent", {})
         for k in self.PLATFORMS:
             lst = sent.get(k, [])
-            if isinstance(lst, list) and len(lst) > self.sent_ring_max:
-                sent[k] = lst[-self.sent_ring_max:]
+            if isinstance(lst, SentRing):
+                lst.trim(self.sent_ring_max)
+            elif isinstance(lst, list):
+                sent[k] = SentRing(lst[-self.sent_ring_max:])
         state["sent"] = sent
+        self._pending = None
+        self._last_write = time.monotonic()
         try:
             _atomic_write_json(self.path, state)
         except OSError as e:
@@ -107,21 +199,38 @@ class StateStore:
             self._save_counter += 1
             if self._save_counter >= 5:
                 self._save_counter = 0
-                self._gist.push(state)
+                self._gist.push(_plain_state(state))
+
+    def save_batched(self, state: Dict[str, Any], min_interval_s: float = 2.0) -> bool:
+        """Save unless the file was written less than min_interval_s ago.
+
+        A skipped save is kept pending and written by the next save(), flush()
+        or load(). Only for writes that are safe to lose on a crash (last_id,
+        etag); sent ids must go through save(). Returns True if written.
+        """
+        if time.monotonic() - self._last_write >= min_interval_s:
+            self.save(state)
+            return True
+        self._pending = state
+        return False
+
+    def flush(self) -> None:
+        """Write a pending save_batched() state, if any."""
+        if self._pending is not None:
+            self.save(self._pending)
 
     def force_gist_push(self, state: Dict[str, Any]) -> None:
         """Force an immediate push to Gist (e.g. after seed)."""
         if self._gist:
-            self._gist.push(state)
+            self._gist.push(_plain_state(state))
 
     @staticmethod
     def sent_has(state: Dict[str, Any], platform: str, entry_id: str) -> bool:
         return entry_id in (state.get("sent", {}).get(platform, []) or [])
 
     def sent_add(self, state: Dict[str, Any], platform: str, entry_id: str) -> None:
-        state.setdefault("sent", {}).setdefault(platform, [])
-        lst: List[str] = state["sent"][platform]
-        if entry_id not in lst:
-            lst.append(entry_id)
-        if len(lst) > self.sent_ring_max:
-            state["sent"][platform] = lst[-self.sent_ring_max:]
+        sent = state.setdefault("sent", {})
+        lst = sent.get(platform)
+        if not isinstance(lst, SentRing):
+            lst = sent[platform] = SentRing(lst or [])
+        lst.add(entry_id, self.sent_ring_max)
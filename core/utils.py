@@ -3,12 +3,48 @@ import os
 import json
 import html
 import logging
-from typing import List
-from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+import random
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional
+from urllib.parse import urlsplit, parse_qsl, urlencode, urlunsplit
+
+try:
+    import regex
+except ImportError:
+    regex = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Lexbor backend: selectolax 1.0 dropped the Modest one (selectolax.parser)
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
 
 log = logging.getLogger("bergfrid.utils")
 
+_TAG_TOKEN_RE = re.compile(r"[^;,/|#]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+_MULTI_NEWLINE_RE = re.compile(r"\n{3,}")
+_BR_RE = re.compile(r"<br\s*/?>", re.I)
+_P_CLOSE_RE = re.compile(r"</p\s*>", re.I)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+# Extended grapheme clusters (what Bluesky counts); stdlib re has no \X
+_GRAPHEME_RE = regex.compile(r"\X") if regex is not None else None
+
 _KEYWORDS_CACHE = None
+_CRITICAL_RE = None
 
 
 def _load_importance_keywords() -> dict:
@@ -31,83 +67,188 @@ def _load_importance_keywords() -> dict:
     return _KEYWORDS_CACHE
 
 
+def _critical_keywords_re() -> re.Pattern:
+    """Compile the critical keywords into a single case-insensitive alternation."""
+    global _CRITICAL_RE
+    if _CRITICAL_RE is None:
+        kw = _load_importance_keywords()
+        words = [k for k in kw.get("critical", []) if k]
+        pattern = "|".join(re.escape(k) for k in words) if words else r"(?!)"
+        _CRITICAL_RE = re.compile(pattern, re.IGNORECASE)
+    return _CRITICAL_RE
+
+
 def truncate_text(text: str, limit: int) -> str:
-    text = text or ""
-    if len(text) > limit:
-        return text[: max(0, limit - 3)] + "..."
-    return text
+    if not text:
+        return ""
+    if len(text) <= limit:
+        return text
+    return text[: max(0, limit - 3)] + "..."
+
+
+def grapheme_len(text: str) -> int:
+    """User-perceived length. Falls back to code points (never fewer) without regex."""
+    if not text:
+        return 0
+    if _GRAPHEME_RE is None:
+        return len(text)
+    return len(_GRAPHEME_RE.findall(text))
+
+
+def truncate_graphemes(text: str, limit: int) -> str:
+    """truncate_text counting grapheme clusters: never splits a flag/ZWJ emoji."""
+    if not text:
+        return ""
+    if len(text) <= limit or _GRAPHEME_RE is None:
+        # code points >= graphemes, so this is always within the limit
+        return truncate_text(text, limit)
+    clusters = _GRAPHEME_RE.findall(text)
+    if len(clusters) <= limit:
+        return text
+    return "".join(clusters[: max(0, limit - 3)]) + "..."
 
 
+@lru_cache(maxsize=256)
 def determine_importance_emoji(text: str) -> str:
     kw = _load_importance_keywords()
-    t = (text or "").lower()
-    if any(k in t for k in kw.get("critical", [])):
+    if text and _critical_keywords_re().search(text):
         return kw.get("critical_emoji", "\U0001f525")
     return kw.get("default_emoji", "\U0001f4f0")
 
 
 def strip_html_to_text(raw_html: str) -> str:
+    """Plain text of an HTML fragment: selectolax, else BeautifulSoup, else regex."""
     raw_html = raw_html or ""
+    if not raw_html:
+        return ""
     try:
-        from bs4 import BeautifulSoup  # type: ignore
-        text = BeautifulSoup(raw_html, "html.parser").get_text("\n")
+        if HTMLParser is not None:
+            tree = HTMLParser(raw_html)
+            root = tree.body or tree.root
+            text = root.text(separator="\n") if root is not None else ""
+        elif BeautifulSoup is not None:
+            text = BeautifulSoup(raw_html, "html.parser").get_text("\n")
+        else:
+            raise ImportError("ni selectolax ni bs4")
         text = html.unescape(text)
-        text = re.sub(r"\n{3,}", "\n\n", text).strip()
-        return text
+        return _MULTI_NEWLINE_RE.sub("\n\n", text).strip()
     except Exception:
-        log.debug("BeautifulSoup indisponible, fallback regex pour strip HTML.")
-        txt = re.sub(r"<br\s*/?>", "\n", raw_html, flags=re.I)
-        txt = re.sub(r"</p\s*>", "\n\n", txt, flags=re.I)
-        txt = re.sub(r"<[^>]+>", "", txt)
+        log.debug("Parseur HTML indisponible, fallback regex pour strip HTML.")
+        txt = _BR_RE.sub("\n", raw_html)
+        txt = _P_CLOSE_RE.sub("\n\n", txt)
+        txt = _HTML_TAG_RE.sub("", txt)
         txt = html.unescape(txt)
-        txt = re.sub(r"\n{3,}", "\n\n", txt).strip()
+        txt = _MULTI_NEWLINE_RE.sub("\n\n", txt).strip()
         return txt
 
 
+@lru_cache(maxsize=256)
 def prettify_summary(text: str, max_chars: int, prefix: str = "",
                      max_paragraphs: int = 5) -> str:
-    text = (text or "").strip()
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    paras = [p.strip() for p in text.split("\n") if p.strip()]
-    if len(paras) > max_paragraphs:
-        paras = paras[:max_paragraphs]
+    # Blank lines are dropped here, so runs of newlines need no collapsing first
+    paras = [p for p in map(str.strip, (text or "").split("\n")) if p][:max_paragraphs]
     pretty = "\n\n".join(prefix + p for p in paras)
     return truncate_text(pretty, max_chars)
 
 
 def extract_tags_from_terms(terms: List[str]) -> List[str]:
-    tags_out: List[str] = []
+    tags_out: Dict[str, str] = {}
     for term in terms:
-        term = (term or "").strip()
         if not term:
             continue
-        parts = re.split(r"[;,/|]\s*|\s+#", term.replace("#", " #").strip())
-        for p in parts:
-            p = re.sub(r"\s+", "", p.strip())
-            if not p:
-                continue
-            if not p.startswith("#"):
-                p = "#" + p
-            tags_out.append(p)
-
-    seen = set()
-    clean = []
-    for x in tags_out:
-        key = x.lower()
-        if key not in seen:
-            seen.add(key)
-            clean.append(x)
-    return clean
+        # Whitespace never separates tags ("Moyen Orient" -> #MoyenOrient)
+        for tok in _TAG_TOKEN_RE.findall(_WHITESPACE_RE.sub("", term)):
+            # casefold: caseless match for non-ASCII too (e.g. "Straße"/"STRASSE")
+            tags_out.setdefault(tok.casefold(), tok)
+    return ["#" + tok for tok in tags_out.values()]
 
 
+@lru_cache(maxsize=2048)
 def add_utm(url: str, source: str, medium: str = "social", campaign: str = "rss") -> str:
     try:
-        u = urlparse(url)
+        u = urlsplit(url)
         q = dict(parse_qsl(u.query, keep_blank_values=True))
         q.setdefault("utm_source", source)
         q.setdefault("utm_medium", medium)
         q.setdefault("utm_campaign", campaign)
-        new_query = urlencode(q, doseq=True)
-        return urlunparse((u.scheme, u.netloc, u.path, u.params, new_query, u.fragment))
+        return urlunsplit(u._replace(query=urlencode(q)))
     except Exception:
         return url
+
+
+def backoff_delay(attempt: int, base: float, max_delay: float = 30.0) -> float:
+    """Jittered exponential backoff for retry attempt n (1-based).
+
+    Picks uniformly in [base, base * 2**attempt] so concurrent publishers hitting
+    the same 429 don't retry in lockstep, capped at max_delay.
+    """
+    return min(max_delay, random.uniform(base, base * (2 ** attempt)))
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds the server asked us to wait, or None if it did not say.
+
+    Reads Retry-After (delta-seconds or HTTP-date, RFC 9110 10.2.3), then the
+    RateLimit-Reset epoch used by Bluesky's PDS, then Mastodon's ISO 8601
+    X-RateLimit-Reset. Header names are matched case-insensitively.
+    """
+    if not headers:
+        return None
+    h = {k.lower(): v for k, v in headers.items()}
+    value = h.get("retry-after")
+    if value:
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    reset = h.get("ratelimit-reset")
+    if reset:
+        try:
+            return max(0.0, float(reset) - time.time())
+        except ValueError:
+            pass
+    reset = h.get("x-ratelimit-reset")
+    if reset:
+        try:
+            return max(0.0, datetime.fromisoformat(reset.strip()).timestamp() - time.time())
+        except ValueError:
+            pass
+    return None
+
+
+def rate_limit_delay(headers: Optional[Mapping[str, str]], attempt: int, base: float,
+                     max_delay: float = 30.0,
+                     server_wait: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait before retrying a 429, or None to give up.
+
+    Honors the server's reset (server_wait if already known, else read from
+    headers): retrying earlier is a guaranteed second 429. A reset beyond
+    max_delay is not worth stalling the tick for; the next tick retries.
+    """
+    delay = backoff_delay(attempt, base, max_delay)
+    if server_wait is None:
+        server_wait = retry_after_seconds(headers)
+    if server_wait is None:
+        return delay
+    if server_wait > max_delay:
+        return None
+    return max(delay, server_wait)
+
+
+def json_dumps(obj) -> bytes:
+    """Compact UTF-8 JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_loads(data):
+    """Parse JSON from bytes or str (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
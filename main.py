@@ -11,7 +11,7 @@ from core.config import (
     DISCORD_TWITTER_CHANNEL_ID, DISCORD_SAINTS_CHANNEL_ID, DISCORD_EMBED_COLOR,
     DISCORD_SUMMARY_MAX, TELEGRAM_SUMMARY_MAX, TWITTER_TWEET_MAX,
     MASTODON_POST_MAX, BLUESKY_POST_MAX,
-    DISCORD_SEND_DELAY_SECONDS,
+    DISCORD_SEND_DELAY_SECONDS, DISCORD_SEND_CONCURRENCY,
     STATE_FILE, BERGFRID_RSS_URL, BASE_DOMAIN,
     RSS_POLL_MINUTES, RSS_FETCH_TIMEOUT, MAX_BACKLOG_POSTS_PER_TICK,
     ARTICLE_PUBLISH_DELAY_SECONDS, SENT_RING_MAX,
@@ -28,21 +28,18 @@ from core.config import (
     load_discord_channels_map, save_discord_channels_map,
     get_all_discord_target_channel_ids,
 )
+from core.http import close_session
 from core.state import StateStore
 from core.rss import parse_rss_with_cache, feed_to_backlog, entry_to_article
 from core.monitoring import HealthMonitor
 
+from publishers.base import publish_all
 from publishers.discord_pub import DiscordPublisher
 from publishers.telegram_pub import TelegramPublisher
 from publishers.twitter_pub import TwitterPublisher
 from publishers.mastodon_pub import MastodonPublisher
 from publishers.bluesky_pub import BlueskyPublisher
 
-try:
-    import aiohttp
-except ImportError:
-    aiohttp = None
-
 
 # =========================
 # LOGGING
@@ -65,7 +62,17 @@ validate_required_env()
 intents = discord.Intents.default()
 intents.message_content = True
 intents.guilds = True
-bot = commands.Bot(command_prefix="bg!", intents=intents, help_command=None)
+
+
+class BergfridBot(commands.Bot):
+    async def close(self):
+        # bot.run() closes its loop on exit: flush and release the session while it still runs
+        state_store.flush()
+        await close_session()
+        await super().close()
+
+
+bot = BergfridBot(command_prefix="bg!", intents=intents, help_command=None)
 
 state_store = StateStore(STATE_FILE, sent_ring_max=SENT_RING_MAX)
 
@@ -74,6 +81,7 @@ discord_pub = DiscordPublisher(
     official_channel_id=DISCORD_OFFICIAL_CHANNEL_ID,
     send_delay=DISCORD_SEND_DELAY_SECONDS,
     summary_max=DISCORD_SUMMARY_MAX,
+    concurrency=DISCORD_SEND_CONCURRENCY,
 )
 
 telegram_pub = TelegramPublisher(
@@ -213,50 +221,6 @@ async def send_discord_embed_to_targets(embed: discord.Embed, reactions: list[st
         await asyncio.sleep(DISCORD_SEND_DELAY_SECONDS)
 
 
-async def send_telegram_text(text: str, parse_mode: str = "HTML",
-                             disable_preview: bool = True, reaction: str = "") -> bool:
-    if aiohttp is None:
-        log.error("aiohttp non installe: impossible d'envoyer sur Telegram.")
-        return False
-
-    endpoint = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": text,
-        "parse_mode": parse_mode,
-        "disable_web_page_preview": disable_preview,
-    }
-
-    try:
-        import json as _json
-        timeout = aiohttp.ClientTimeout(total=20)
-        async with aiohttp.ClientSession(timeout=timeout) as sess:
-            async with sess.post(endpoint, data=payload) as resp:
-                body = await resp.text()
-                if resp.status != 200:
-                    log.warning("Telegram msg special erreur status=%s body=%s", resp.status, body[:600])
-                    return False
-                # Set reaction if requested
-                if reaction:
-                    try:
-                        data = _json.loads(body)
-                        msg_id = data.get("result", {}).get("message_id")
-                        if msg_id:
-                            react_endpoint = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/setMessageReaction"
-                            react_payload = {
-                                "chat_id": TELEGRAM_CHAT_ID,
-                                "message_id": msg_id,
-                                "reaction": _json.dumps([{"type": "emoji", "emoji": reaction}]),
-                            }
-                            await sess.post(react_endpoint, data=react_payload)
-                    except Exception:
-                        pass
-        return True
-    except Exception as e:
-        log.warning("Telegram msg special exception: %s", e)
-        return False
-
-
 async def send_alert_to_platforms(message: str) -> None:
     """Send an alert message to the Discord log channel only."""
     if not DISCORD_LOG_CHANNEL_ID:
@@ -552,7 +516,10 @@ async def bergfrid_watcher():
     feed = await parse_rss_with_cache(
         BERGFRID_RSS_URL, BASE_DOMAIN, state, timeout=RSS_FETCH_TIMEOUT
     )
-    state_store.save(state)  # persist etag/modified even if no publish
+    # 304 Not Modified: nothing new, etag/modified unchanged -> no parse, no save
+    if getattr(feed, "status", None) == 304:
+        return
+    state_store.save_batched(state)  # persist etag/modified even if no publish
 
     entries = getattr(feed, "entries", None) or []
     if not entries:
@@ -588,63 +555,41 @@ async def bergfrid_watcher():
         all_ok = True
         pub_results = {}  # platform -> True/False
 
-        # Discord
+        # Toutes les plateformes en attente sont publiees en parallele
+        jobs = {}
         if "discord" in enabled and not StateStore.sent_has(state, "discord", eid):
-            log.info("Publication Discord: %s", article.title)
-            discord_ok = await discord_pub.publish(article, targets.get("discord", {}))
-            pub_results["discord"] = discord_ok
-            if discord_ok:
-                published_any = True
-                state_store.sent_add(state, "discord", eid)
+            jobs["discord"] = (discord_pub, targets.get("discord", {}))
+        if "telegram" in enabled and not StateStore.sent_has(state, "telegram", eid):
+            jobs["telegram"] = (telegram_pub, targets.get("telegram", {}))
+        for platform, pub in _optional_publishers.items():
+            if platform in enabled and not StateStore.sent_has(state, platform, eid):
+                if health.is_in_cooldown(platform):
+                    continue
+                jobs[platform] = (pub, targets.get(platform, {}))
+
+        def _persist_success(platform: str, ok: bool) -> None:
+            # Saved as each platform finishes: a crash while another one is
+            # still retrying must not re-post where it already succeeded
+            if ok:
+                state_store.sent_add(state, platform, eid)
                 mark_article_published_today(state)
                 state_store.save(state)
-                health.record_success("discord")
-            else:
-                all_ok = False
-                if health.record_failure("discord"):
-                    await send_alert_to_platforms(
-                        f"Discord a echoue {health.get_failures('discord')} fois consecutivement."
-                    )
 
-        # Telegram
-        if "telegram" in enabled and not StateStore.sent_has(state, "telegram", eid):
-            log.info("Publication Telegram: %s", article.title)
-            telegram_ok = await telegram_pub.publish(article, targets.get("telegram", {}))
-            pub_results["telegram"] = telegram_ok
-            if telegram_ok:
+        if jobs:
+            log.info("Publication %s: %s", ", ".join(jobs), article.title)
+            pub_results = await publish_all(article, jobs, on_result=_persist_success)
+
+        for platform, ok in pub_results.items():
+            if ok:
                 published_any = True
-                state_store.sent_add(state, "telegram", eid)
-                mark_article_published_today(state)
-                state_store.save(state)
-                health.record_success("telegram")
+                health.record_success(platform)
             else:
                 all_ok = False
-                if health.record_failure("telegram"):
+                if health.record_failure(platform):
                     await send_alert_to_platforms(
-                        f"Telegram a echoue {health.get_failures('telegram')} fois consecutivement."
+                        f"{platform.capitalize()} a echoue {health.get_failures(platform)} fois consecutivement."
                     )
 
-        # Plateformes optionnelles (twitter, mastodon, bluesky)
-        for platform, pub in _optional_publishers.items():
-            if platform in enabled and not StateStore.sent_has(state, platform, eid):
-                if health.is_in_cooldown(platform):
-                    continue
-                log.info("Publication %s: %s", platform, article.title)
-                plat_ok = await pub.publish(article, targets.get(platform, {}))
-                pub_results[platform] = plat_ok
-                if plat_ok:
-                    published_any = True
-                    state_store.sent_add(state, platform, eid)
-                    mark_article_published_today(state)
-                    state_store.save(state)
-                    health.record_success(platform)
-                else:
-                    all_ok = False
-                    if health.record_failure(platform):
-                        await send_alert_to_platforms(
-                            f"{platform.capitalize()} a echoue {health.get_failures(platform)} fois consecutivement."
-                        )
-
         # Log de publication sur Discord
         if pub_results:
             await send_publish_log(article.title, pub_results)
@@ -655,7 +600,8 @@ async def bergfrid_watcher():
 
         if all_ok:
             state["last_id"] = eid
-            state_store.save(state)
+            # sent ids were saved just above; losing last_id only re-checks this entry
+            state_store.save_batched(state)
         else:
             log.warning("Publication partielle pour id=%s. Stop pour retry au prochain tick.", eid)
             return
@@ -744,7 +690,7 @@ async def nightly_promo():
         await send_discord_embed_to_targets(build_night_promo_discord(), reactions=["\u271d\ufe0f"])
 
     if "telegram" in enabled:
-        await send_telegram_text(build_night_promo_telegram(), disable_preview=True, reaction="\u271d\ufe0f")
+        await telegram_pub.send_text(build_night_promo_telegram(), disable_preview=True, reaction="\u271d\ufe0f")
 
     state["nightly_promo_sent_date"] = today
     state_store.save(state)
@@ -772,7 +718,7 @@ async def morning_message():
         await send_discord_embed_to_targets(build_morning_discord(), reactions=["\u271d\ufe0f"])
 
     if "telegram" in enabled:
-        await send_telegram_text(build_morning_telegram(), disable_preview=True, reaction="\u271d\ufe0f")
+        await telegram_pub.send_text(build_morning_telegram(), disable_preview=True, reaction="\u271d\ufe0f")
 
     state["morning_sent_date"] = today
     state_store.save(state)
@@ -1032,17 +978,8 @@ async def preview_message(ctx: commands.Context, nom: str = ""):
         await ctx.send(f"\U0001f50d **Preview : {label}**\n\u2500\u2500\u2500\n{content}")
 
 
-async def _shutdown():
-    await telegram_pub.close()
-
-
 if __name__ == "__main__":
     try:
         bot.run(DISCORD_TOKEN)
     finally:
-        try:
-            loop = asyncio.get_event_loop()
-            if not loop.is_running():
-                loop.run_until_complete(_shutdown())
-        except Exception:
-            pass
+        state_store.flush()
@@ -1,8 +1,12 @@
+import asyncio
+import logging
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from core.models import Article
 
+log = logging.getLogger("bergfrid.publisher")
+
 
 class Publisher(ABC):
     name: str
@@ -10,3 +14,34 @@ class Publisher(ABC):
     @abstractmethod
     async def publish(self, article: Article, cfg: Dict[str, Any]) -> bool:
         ...
+
+
+async def publish_all(
+    article: Article,
+    jobs: Dict[str, Tuple[Publisher, Dict[str, Any]]],
+    on_result: Optional[Callable[[str, bool], None]] = None,
+) -> Dict[str, bool]:
+    """Publish one article on several platforms concurrently.
+
+    jobs maps platform -> (publisher, cfg). Returns platform -> ok, in the
+    same order; a publisher raising counts as a failure. on_result(platform,
+    ok) is called as soon as each job finishes, so a success can be persisted
+    while slower platforms are still retrying.
+    """
+    async def _run(platform: str, pub: Publisher, cfg: Dict[str, Any]) -> bool:
+        try:
+            ok = bool(await pub.publish(article, cfg))
+        except Exception as e:
+            log.error("Publication %s: exception %s", platform, e)
+            ok = False
+        if on_result is not None:
+            try:
+                on_result(platform, ok)
+            except Exception:
+                log.exception("Publication %s: erreur dans on_result", platform)
+        return ok
+
+    results = await asyncio.gather(
+        *(_run(platform, pub, cfg) for platform, (pub, cfg) in jobs.items())
+    )
+    return dict(zip(jobs, results))
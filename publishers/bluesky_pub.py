@@ -1,39 +1,59 @@
 import asyncio
-import io
 import logging
-import urllib.request
+from collections import OrderedDict
 from typing import Dict, Any
 
+from core import image_cache
+from core.http import MAX_SOURCE_IMAGE_BYTES
+from core.images import shrink_image
 from core.models import Article
-from core.utils import determine_importance_emoji, truncate_text, add_utm
+from core.utils import (
+    determine_importance_emoji, truncate_text, truncate_graphemes, grapheme_len,
+    add_utm, backoff_delay, rate_limit_delay,
+)
+
+try:
+    from atproto import AsyncClient, models
+except ImportError:
+    AsyncClient = None
+    models = None
 
 log = logging.getLogger("bergfrid.publisher.bluesky")
 
+# Only these are retried; anything else (other 4xx, transport errors) gives up
+# and the next tick retries the article
+_RETRYABLE = frozenset({408, 425, 429, 500, 502, 503, 504})
+_AUTH_ERRORS = frozenset({"ExpiredToken", "InvalidToken", "AuthenticationRequired"})
+
 
 class BlueskyPublisher:
     name = "bluesky"
 
     def __init__(self, handle: str, app_password: str,
                  post_max: int = 300,
-                 max_retries: int = 3, retry_base_delay: float = 5):
+                 max_retries: int = 3, retry_base_delay: float = 5,
+                 retry_max_delay: float = 30):
         self.handle = handle
         self.app_password = app_password
         self.post_max = post_max
         self.max_retries = max_retries
         self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
         self._client = None
+        # image_url -> uploaded blob ref (LRU). Blobs are content-addressed, so
+        # recurring images (category banners, retried articles) upload once.
+        self._blob_cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._bg_tasks = set()  # strong refs so pending likes aren't GC'd
 
-    def _ensure_client(self):
+    async def _ensure_client(self):
         if self._client is not None:
             return self._client
-        try:
-            from atproto import Client
-        except ImportError:
+        if AsyncClient is None:
             log.error("atproto non installe. pip install atproto")
             return None
-        self._client = Client()
+        self._client = AsyncClient()
         try:
-            self._client.login(self.handle, self.app_password)
+            await self._client.login(self.handle, self.app_password)
         except Exception as e:
             log.error("Bluesky: echec login pour %s: %s", self.handle, e)
             self._client = None
@@ -43,85 +63,46 @@ class BlueskyPublisher:
     def _build_post_text(self, article: Article) -> str:
         """Build text body (without URL — URL goes in the embed card)."""
         emoji = determine_importance_emoji(article.summary)
+        hashtag_line = " ".join(article.tags[:5]) if article.tags else ""
 
-        if article.social_summary:
-            text = f"{emoji} {article.social_summary}"
-        else:
-            text = f"{emoji} {article.title}"
-
-        # Hashtags
-        if article.tags:
-            hashtag_line = " ".join(article.tags[:5])
-            budget = self.post_max - len(hashtag_line) - 2  # 2 for \n\n
-            text = truncate_text(text, budget)
-            text = f"{text}\n\n{hashtag_line}"
-        else:
-            text = truncate_text(text, self.post_max)
-
-        return text
+        # post_max is a grapheme budget (Bluesky validates graphemes, not chars)
+        budget = self.post_max
+        if hashtag_line:
+            budget -= grapheme_len(hashtag_line) + 2  # 2 for \n\n
+        body = truncate_graphemes(f"{emoji} {article.social_summary or article.title}", budget)
+        return f"{body}\n\n{hashtag_line}" if hashtag_line else body
 
     _BLOB_MAX = 1_000_000  # Bluesky max blob size (bytes)
-
-    @staticmethod
-    def _compress_image(data: bytes, max_bytes: int) -> bytes:
-        """Compress image to fit within max_bytes using Pillow."""
-        try:
-            from PIL import Image
-        except ImportError:
-            log.warning("Pillow non installe, impossible de compresser l'image.")
-            return data
-
-        img = Image.open(io.BytesIO(data))
-        img = img.convert("RGB")
-
-        # Reduire la resolution si tres grande
-        max_dim = 1600
-        if max(img.size) > max_dim:
-            img.thumbnail((max_dim, max_dim), Image.LANCZOS)
-
-        # Compression JPEG avec qualite decroissante
-        for quality in (85, 70, 55, 40):
-            buf = io.BytesIO()
-            img.save(buf, format="JPEG", quality=quality, optimize=True)
-            result = buf.getvalue()
-            if len(result) <= max_bytes:
-                log.info(
-                    "Image compressee: %d KB -> %d KB (q=%d)",
-                    len(data) // 1024, len(result) // 1024, quality,
-                )
-                return result
-
-        log.warning("Image toujours trop grosse apres compression (%d KB).", len(result) // 1024)
-        return result
-
-    def _upload_thumb(self, image_url: str):
-        """Download image and upload as blob for embed thumbnail."""
-        client = self._ensure_client()
+    _THUMB_DIM = 600  # link-card thumbnails never render larger
+    _BLOB_CACHE_MAX = 256
+
+    async def _upload_thumb(self, image_url: str):
+        """Download image, shrink it to a card thumbnail and upload as blob."""
+        blob = self._blob_cache.get(image_url)
+        if blob is not None:
+            self._blob_cache.move_to_end(image_url)
+            return blob
+        client = await self._ensure_client()
         if not client:
             return None
         try:
-            req = urllib.request.Request(
-                image_url, headers={"User-Agent": "Bergfrid-Bot/1.0"}
+            # Large sources are fine: shrink_image brings them under _BLOB_MAX
+            data, _ = await image_cache.get_bytes(image_url, MAX_SOURCE_IMAGE_BYTES)
+            data, _ = await asyncio.to_thread(
+                shrink_image, data, self._THUMB_DIM, self._BLOB_MAX
             )
-            with urllib.request.urlopen(req, timeout=15) as resp:
-                data = resp.read()
-            if len(data) > self._BLOB_MAX:
-                log.info(
-                    "Image trop grosse (%d KB > %d KB), compression...",
-                    len(data) // 1024, self._BLOB_MAX // 1024,
-                )
-                data = self._compress_image(data, self._BLOB_MAX)
-            blob_resp = client.upload_blob(data)
+            blob_resp = await client.upload_blob(data)
+            self._blob_cache[image_url] = blob_resp.blob
+            if len(self._blob_cache) > self._BLOB_CACHE_MAX:
+                self._blob_cache.popitem(last=False)
             return blob_resp.blob
         except Exception as e:
             log.warning("Bluesky: echec upload image: %s", e)
             return None
 
-    def _build_embed(self, article: Article):
+    async def _build_embed(self, article: Article):
         """Build an external embed (link card) with optional thumbnail."""
-        try:
-            from atproto import models
-        except ImportError:
+        if models is None:
             return None
 
         url = add_utm(article.url, source="bluesky", medium="social", campaign="rss")
@@ -131,7 +112,7 @@ class BlueskyPublisher:
 
         thumb = None
         if article.image_url:
-            thumb = self._upload_thumb(article.image_url)
+            thumb = await self._upload_thumb(article.image_url)
 
         return models.AppBskyEmbedExternal.Main(
             external=models.AppBskyEmbedExternal.External(
@@ -142,32 +123,33 @@ class BlueskyPublisher:
             )
         )
 
-    def _re_login(self) -> bool:
+    async def _re_login(self) -> bool:
         """Force a fresh login (session expired)."""
         self._client = None
-        return self._ensure_client() is not None
+        return await self._ensure_client() is not None
 
-    def _post_skeet(self, text: str, embed):
-        """Synchronous post (called via to_thread). Returns response or None."""
-        client = self._ensure_client()
+    async def _post_skeet(self, text: str, embed):
+        """Post with retry/backoff. Returns response or None."""
+        client = await self._ensure_client()
         if client is None:
             return None
 
         _relogged = False
         for attempt in range(1, self.max_retries + 1):
             try:
-                resp = client.send_post(text=text, embed=embed)
+                resp = await client.send_post(text=text, embed=embed)
                 if resp and resp.uri:
                     return resp
                 log.warning("Bluesky: reponse inattendue: %s", resp)
                 return None
             except Exception as e:
-                err_str = str(e).lower()
                 # atproto SDK: status_code sur e.response.status_code
                 _resp = getattr(e, "response", None)
                 status_code = getattr(_resp, "status_code", None)
-                # Message d'erreur XRPC (ex: "Record/text must not be longer than 300 graphemes")
+                # Erreur XRPC (ex: error="ExpiredToken",
+                # message="Record/text must not be longer than 300 graphemes")
                 _content = getattr(_resp, "content", None)
+                xrpc_error = getattr(_content, "error", None) or ""
                 xrpc_msg = getattr(_content, "message", None) or ""
 
                 log.warning(
@@ -176,38 +158,19 @@ class BlueskyPublisher:
                     xrpc_msg or e,
                 )
 
-                # 400 Bad Request = contenu invalide, ne pas retry
-                if status_code == 400 or (
-                    "status_code=400" in err_str
-                ):
-                    log.error(
-                        "Bluesky 400 Bad Request: %s (texte=%d chars, embed=%s)",
-                        xrpc_msg or e, len(text),
-                        type(embed).__name__ if embed else None,
-                    )
-                    return None
-
-                # Rate limit (429) -> retry avec backoff
-                if status_code == 429 or "ratelimit" in err_str.replace(" ", ""):
-                    delay = self.retry_base_delay * (2 ** (attempt - 1))
-                    log.warning(
-                        "Bluesky rate limit. Retry dans %.1fs (tentative %d/%d).",
-                        delay, attempt, self.max_retries,
-                    )
-                    if attempt < self.max_retries:
-                        import time
-                        time.sleep(delay)
-                    continue
-
-                # Auth / session expired -> re-login once
-                if not _relogged and (
-                    status_code == 401
-                    or "expired" in err_str
-                    or "unauthorized" in err_str
-                    or ("auth" in err_str and "token" in err_str)
-                ):
+                if status_code is None:
+                    # Pas de reponse HTTP: seul cas ou l'on analyse le message
+                    err_str = str(e).lower()
+                    if "ratelimit" in err_str.replace(" ", ""):
+                        status_code = 429
+                    elif ("expired" in err_str or "unauthorized" in err_str
+                          or ("auth" in err_str and "token" in err_str)):
+                        status_code = 401
+
+                # Auth / session expired -> re-login once (the PDS answers 400 ExpiredToken)
+                if not _relogged and (status_code == 401 or xrpc_error in _AUTH_ERRORS):
                     log.warning("Bluesky: session expiree, re-login...")
-                    if self._re_login():
+                    if await self._re_login():
                         _relogged = True
                         client = self._client
                         continue
@@ -215,45 +178,71 @@ class BlueskyPublisher:
                         log.error("Bluesky: echec re-login.")
                         return False
 
-                # Erreur serveur (5xx) -> retry avec backoff
-                if status_code and 500 <= status_code < 600:
-                    delay = self.retry_base_delay * (2 ** (attempt - 1))
+                if status_code not in _RETRYABLE:
+                    if status_code is None:
+                        # Transport error / timeout (atproto: response=None). createRecord
+                        # is not idempotent: the post may have gone through, don't resend.
+                        log.error("Bluesky erreur sans reponse HTTP, abandon: %r", e)
+                    else:
+                        log.error(
+                            "Bluesky %d %s: %s (texte=%d chars, embed=%s)",
+                            status_code, xrpc_error, xrpc_msg or e, len(text),
+                            type(embed).__name__ if embed else None,
+                        )
+                    return None
+
+                # _RETRYABLE (408, 425, 429, 500, 502-504) -> retry avec backoff
+                if status_code == 429:
+                    # The PDS sends RateLimit-Reset (epoch) on 429s
+                    delay = rate_limit_delay(
+                        getattr(_resp, "headers", None), attempt,
+                        self.retry_base_delay, self.retry_max_delay,
+                    )
+                    if delay is None:
+                        log.warning("Bluesky rate limit: reset trop lointain, abandon (prochain tick).")
+                        return None
+                    log.warning(
+                        "Bluesky rate limit. Retry dans %.1fs (tentative %d/%d).",
+                        delay, attempt, self.max_retries,
+                    )
+                else:
+                    delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
                     log.warning(
                         "Bluesky erreur serveur %d. Retry dans %.1fs (tentative %d/%d).",
                         status_code, delay, attempt, self.max_retries,
                     )
-                    if attempt < self.max_retries:
-                        import time
-                        time.sleep(delay)
-                    continue
-
-                # Autre erreur inconnue -> ne pas retry
-                log.error("Bluesky erreur inattendue: %s", e)
-                return None
+                if attempt < self.max_retries:
+                    await asyncio.sleep(delay)
 
         log.error("Bluesky: echec apres %d tentatives.", self.max_retries)
         return None
 
-    def _like_post(self, uri: str, cid: str) -> None:
+    async def _like_post(self, uri: str, cid: str) -> None:
         """Like own post to encourage interaction."""
-        client = self._ensure_client()
+        client = await self._ensure_client()
         if not client:
             return
         try:
-            client.like(uri=uri, cid=cid)
+            await client.like(uri=uri, cid=cid)
         except Exception as e:
             log.warning("Bluesky: echec like post: %s", e)
 
     async def publish(self, article: Article, cfg: Dict[str, Any]) -> bool:
         try:
             text = self._build_post_text(article)
-            embed = self._build_embed(article)
-            resp = await asyncio.to_thread(self._post_skeet, text, embed)
+            embed = await self._build_embed(article)
+            resp = await self._post_skeet(text, embed)
             if resp:
                 log.info("Bluesky: publie '%s'.", article.title[:60])
-                await asyncio.to_thread(self._like_post, resp.uri, resp.cid)
+                # The like is cosmetic: don't hold the publish result for its round-trip
+                task = asyncio.create_task(self._like_post(resp.uri, resp.cid))
+                self._bg_tasks.add(task)
+                task.add_done_callback(self._bg_tasks.discard)
                 return True
             else:
+                # Don't keep reusing a blob ref that may be what the PDS rejected
+                if article.image_url:
+                    self._blob_cache.pop(article.image_url, None)
                 log.error("Bluesky: echec publication '%s'.", article.title[:60])
                 return False
         except Exception as e:
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import random
 from typing import Dict, Any, Optional, List
 
 import discord
@@ -15,33 +16,72 @@ class DiscordPublisher:
     name = "discord"
 
     def __init__(self, bot: discord.Client, official_channel_id: int,
-                 send_delay: float = 0.2, summary_max: int = 2200):
+                 send_delay: float = 0.2, summary_max: int = 2200,
+                 concurrency: int = 5):
         self.bot = bot
         self.official_channel_id = official_channel_id
         self.send_delay = send_delay
         self.summary_max = summary_max
+        self.concurrency = max(1, concurrency)
+        self._channel_cache: Dict[int, discord.abc.Messageable] = {}
 
     def _get_target_channel_ids(self) -> List[int]:
-        """Deduplicated list of target channel IDs (official + per-server)."""
+        """Deduplicated list of target channel IDs (official + per-server).
+
+        dict.fromkeys keeps first-seen order, so the official channel is always
+        scheduled first by the send fan-out.
+        """
         ids = [self.official_channel_id]
         ids.extend(load_discord_channels_map().values())
         return list(dict.fromkeys(ids))
 
     async def _resolve_channel(self, channel_id: int) -> Optional[discord.abc.Messageable]:
-        ch = self.bot.get_channel(channel_id)
+        ch = self._channel_cache.get(channel_id)
         if ch is not None:
             return ch
+        ch = self.bot.get_channel(channel_id)
+        if ch is None:
+            try:
+                ch = await self.bot.fetch_channel(channel_id)
+            except discord.NotFound:
+                log.warning("Canal Discord %d introuvable.", channel_id)
+                return None
+            except discord.Forbidden:
+                log.warning("Acces refuse au canal Discord %d.", channel_id)
+                return None
+            except Exception as e:
+                log.error("Erreur resolution canal %d: %s", channel_id, e)
+                return None
+        self._channel_cache[channel_id] = ch
+        return ch
+
+    async def _send_to_channel(self, cid: int, embed: discord.Embed, title: str) -> bool:
+        """Send the article embed to one channel. Returns True if the message was sent."""
+        ch = await self._resolve_channel(cid)
+        if not ch:
+            return False
         try:
-            return await self.bot.fetch_channel(channel_id)
-        except discord.NotFound:
-            log.warning("Canal Discord %d introuvable.", channel_id)
-            return None
+            msg = await ch.send(embed=embed)
         except discord.Forbidden:
-            log.warning("Acces refuse au canal Discord %d.", channel_id)
-            return None
-        except Exception as e:
-            log.error("Erreur resolution canal %d: %s", channel_id, e)
-            return None
+            log.warning("Permission refusee pour envoyer dans le canal %d.", cid)
+            self._channel_cache.pop(cid, None)
+            return False
+        except discord.HTTPException as e:
+            log.error("Erreur HTTP Discord pour canal %d: %s", cid, e)
+            if isinstance(e, discord.NotFound):
+                self._channel_cache.pop(cid, None)
+            return False
+        # Add thumbs up reaction to encourage interaction
+        try:
+            await msg.add_reaction("\U0001f44d")
+        except Exception:
+            pass
+        # Create a discussion thread under the article
+        try:
+            await msg.create_thread(name=title[:100])
+        except Exception as te:
+            log.warning("Impossible de creer le fil pour canal %d: %s", cid, te)
+        return True
 
     async def publish(self, article: Article, cfg: Dict[str, Any]) -> bool:
         try:
@@ -80,36 +120,26 @@ class DiscordPublisher:
             if article.published_at:
                 embed.timestamp = article.published_at
 
-            target_ids = self._get_target_channel_ids()
-            sent_count = 0
-            fail_count = 0
-
-            for cid in target_ids:
-                ch = await self._resolve_channel(cid)
-                if not ch:
-                    fail_count += 1
-                    continue
-                try:
-                    msg = await ch.send(embed=embed)
-                    sent_count += 1
-                    # Add thumbs up reaction to encourage interaction
-                    try:
-                        await msg.add_reaction("\U0001f44d")
-                    except Exception:
-                        pass
-                    # Create a discussion thread under the article
+            # stat()/read of discord_channels.json stays off the event loop
+            target_ids = await asyncio.to_thread(self._get_target_channel_ids)
+            sem = asyncio.Semaphore(self.concurrency)
+
+            async def _send(cid: int) -> bool:
+                async with sem:
                     try:
-                        thread_name = article.title[:100] if len(article.title) > 100 else article.title
-                        await msg.create_thread(name=thread_name)
-                    except Exception as te:
-                        log.warning("Impossible de creer le fil pour canal %d: %s", cid, te)
-                except discord.Forbidden:
-                    log.warning("Permission refusee pour envoyer dans le canal %d.", cid)
-                    fail_count += 1
-                except discord.HTTPException as e:
-                    log.error("Erreur HTTP Discord pour canal %d: %s", cid, e)
-                    fail_count += 1
-                await asyncio.sleep(self.send_delay)
+                        return await self._send_to_channel(cid, embed, article.title)
+                    finally:
+                        # Jitter: spread sends instead of hitting Discord in lockstep
+                        await asyncio.sleep(random.uniform(0, self.send_delay))
+
+            results = await asyncio.gather(
+                *(_send(cid) for cid in target_ids), return_exceptions=True
+            )
+            for cid, r in zip(target_ids, results):
+                if isinstance(r, BaseException):
+                    log.error("Erreur envoi Discord canal %d: %s", cid, r)
+            sent_count = sum(1 for r in results if r is True)
+            fail_count = len(results) - sent_count
 
             if sent_count > 0:
                 log.info("Discord: publie '%s' dans %d canal/canaux (%d echec(s)).",
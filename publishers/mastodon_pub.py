@@ -1,26 +1,50 @@
 import asyncio
+import hashlib
+import io
 import logging
-import urllib.request
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from core import image_cache
+from core.http import MAX_SOURCE_IMAGE_BYTES, get_session
+from core.images import shrink_image
 from core.models import Article
-from core.utils import determine_importance_emoji, truncate_text, add_utm
+from core.utils import (
+    determine_importance_emoji, truncate_text, add_utm, backoff_delay, rate_limit_delay,
+)
 
 log = logging.getLogger("bergfrid.publisher.mastodon")
 
 
 class MastodonPublisher:
     name = "mastodon"
+    _IMAGE_DIM = 1600  # long edge; plenty for timeline and lightbox display
+    _IMAGE_MAX = 8_000_000  # stay under the default 8-16 MB instance limits
+    _MEDIA_CACHE_MAX = 256
 
     def __init__(self, instance_url: str, access_token: str,
                  post_max: int = 500,
-                 max_retries: int = 3, retry_base_delay: float = 5):
+                 max_retries: int = 3, retry_base_delay: float = 5,
+                 retry_max_delay: float = 30):
         self.instance_url = instance_url.rstrip("/")
         self.access_token = access_token
         self.post_max = post_max
         self.max_retries = max_retries
         self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._statuses_url = f"{self.instance_url}/api/v1/statuses"
+        self._auth_headers = {"Authorization": f"Bearer {access_token}"}
+        # Mastodon.py client, only used for multipart media uploads
         self._client = None
+        # image_url -> uploaded media (LRU), reused if the status post is retried.
+        # A media attachment can only be attached once: dropped after posting,
+        # and on a 4xx (Mastodon purges unattached media, the id may be stale).
+        self._media_cache: "OrderedDict[str, dict]" = OrderedDict()
 
     def _ensure_client(self):
         if self._client is not None:
@@ -39,104 +63,133 @@ class MastodonPublisher:
     def _build_post(self, article: Article) -> str:
         url = add_utm(article.url, source="mastodon", medium="social", campaign="rss")
         emoji = determine_importance_emoji(article.summary)
-
-        # Reserve space for URL and hashtags
         hashtag_line = " ".join(article.tags[:5]) if article.tags else ""
-        fixed_len = len(url) + 1  # \n before url
-        if hashtag_line:
-            fixed_len += len(hashtag_line) + 2  # \n\n before hashtags
-        available = self.post_max - fixed_len
-
-        if article.social_summary:
-            text = f"{emoji} {article.social_summary}"
-        else:
-            text = f"{emoji} {article.title}"
-        text = truncate_text(text, available)
-
-        if hashtag_line:
-            return f"{text}\n\n{hashtag_line}\n{url}"
-        return f"{text}\n{url}"
-
-    def _upload_image(self, image_url: str) -> Optional[dict]:
-        """Download article image and upload to Mastodon as media attachment."""
+
+        # Layout: text\n\nhashtags\nurl (or text\nurl); reserve the fixed tail
+        tail = f"\n\n{hashtag_line}\n{url}" if hashtag_line else f"\n{url}"
+        text = truncate_text(
+            f"{emoji} {article.social_summary or article.title}",
+            self.post_max - len(tail),
+        )
+        return text + tail
+
+    def _media_post(self, data: bytes, content_type: str) -> Optional[dict]:
+        """Synchronous media upload (called via to_thread)."""
         client = self._ensure_client()
         if not client:
             return None
+
+        # Mastodon.py takes file-like data as long as mime_type is given
+        ext = ".jpg" if "jpeg" in content_type else ".png"
+        return client.media_post(
+            io.BytesIO(data), mime_type=content_type, file_name=f"image{ext}"
+        )
+
+    async def _upload_image(self, image_url: str) -> Optional[dict]:
+        """Download article image and upload to Mastodon as media attachment."""
+        media = self._media_cache.get(image_url)
+        if media is not None:
+            self._media_cache.move_to_end(image_url)
+            return media
         try:
-            req = urllib.request.Request(
-                image_url, headers={"User-Agent": "Bergfrid-Bot/1.0"}
+            data, content_type = await image_cache.get_bytes(image_url, MAX_SOURCE_IMAGE_BYTES)
+            data, new_type = await asyncio.to_thread(
+                shrink_image, data, self._IMAGE_DIM, self._IMAGE_MAX
             )
-            with urllib.request.urlopen(req, timeout=15) as resp:
-                data = resp.read()
-                content_type = resp.headers.get("Content-Type", "image/jpeg")
-
-            # Mastodon.py media_post accepts file-like or bytes via file_name
-            import tempfile
-            import os
-            ext = ".jpg" if "jpeg" in content_type else ".png"
-            with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp:
-                tmp.write(data)
-                tmp_path = tmp.name
-            try:
-                media = client.media_post(tmp_path, mime_type=content_type)
-                return media
-            finally:
-                os.unlink(tmp_path)
+            media = await asyncio.to_thread(
+                self._media_post, data, new_type or content_type or "image/jpeg"
+            )
+            if media:
+                self._media_cache[image_url] = media
+                if len(self._media_cache) > self._MEDIA_CACHE_MAX:
+                    self._media_cache.popitem(last=False)
+            return media
         except Exception as e:
             log.warning("Mastodon: echec upload image: %s", e)
             return None
 
-    def _post_status(self, text: str, media_ids: Optional[list] = None) -> Optional[dict]:
-        """Synchronous post (called via to_thread). Returns status dict or None."""
-        client = self._ensure_client()
-        if client is None:
-            return None
+    @staticmethod
+    def _idempotency_key(article: Article) -> str:
+        return hashlib.sha256(f"bergfrid:{article.id}".encode("utf-8")).hexdigest()
+
+    async def _post_status(self, text: str, media_ids: Optional[list] = None,
+                           idempotency_key: Optional[str] = None,
+                           ) -> Tuple[Optional[dict], Optional[int]]:
+        """POST /api/v1/statuses with retry/backoff.
 
-        from mastodon import MastodonError, MastodonRatelimitError, MastodonServerError
+        Returns (status dict or None, last HTTP status or None on network errors).
+
+        The POST is not idempotent: a timeout may hide an accepted status. With
+        an Idempotency-Key, Mastodon returns the first status for retries
+        carrying the same key (kept for 1 h) instead of posting it again.
+        """
+        sess = await get_session()
+        if sess is None:
+            return None, None
+
+        form = [("status", text), ("visibility", "public")]
+        form.extend(("media_ids[]", str(mid)) for mid in media_ids or ())
+        headers = self._auth_headers
+        if idempotency_key:
+            headers = {**headers, "Idempotency-Key": idempotency_key}
 
         for attempt in range(1, self.max_retries + 1):
             try:
-                resp = client.status_post(
-                    text, visibility="public", media_ids=media_ids
-                )
-                if resp and resp.get("id"):
-                    return resp
-                log.warning("Mastodon: reponse inattendue: %s", resp)
-                return None
-            except MastodonRatelimitError:
-                delay = self.retry_base_delay * (2 ** (attempt - 1))
+                async with sess.post(self._statuses_url, data=form, headers=headers) as resp:
+                    if resp.status == 200:
+                        data = await resp.json(content_type=None)
+                        if data and data.get("id"):
+                            return data, resp.status
+                        log.warning("Mastodon: reponse inattendue: %s", data)
+                        return None, resp.status
+
+                    body = await resp.text()
+                    if resp.status == 429:
+                        delay = rate_limit_delay(
+                            resp.headers, attempt, self.retry_base_delay, self.retry_max_delay
+                        )
+                        if delay is None:
+                            log.warning("Mastodon rate limit: reset trop lointain, abandon (prochain tick).")
+                            return None, resp.status
+                        log.warning(
+                            "Mastodon rate limit. Retry dans %.1fs (tentative %d/%d).",
+                            delay, attempt, self.max_retries,
+                        )
+                    elif resp.status >= 500:
+                        delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+                        log.warning(
+                            "Mastodon erreur serveur %d. Retry dans %.1fs (tentative %d/%d).",
+                            resp.status, delay, attempt, self.max_retries,
+                        )
+                    else:
+                        log.error(
+                            "Mastodon erreur API %d (tentative %d/%d): %s",
+                            resp.status, attempt, self.max_retries, body[:300],
+                        )
+                        return None, resp.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
                 log.warning(
-                    "Mastodon rate limit. Retry dans %.1fs (tentative %d/%d).",
-                    delay, attempt, self.max_retries,
-                )
-                if attempt < self.max_retries:
-                    import time
-                    time.sleep(delay)
-                continue
-            except MastodonServerError as e:
-                delay = self.retry_base_delay * (2 ** (attempt - 1))
-                log.warning(
-                    "Mastodon erreur serveur %s. Retry dans %.1fs (tentative %d/%d).",
+                    "Mastodon erreur reseau %s. Retry dans %.1fs (tentative %d/%d).",
                     e, delay, attempt, self.max_retries,
                 )
-                if attempt < self.max_retries:
-                    import time
-                    time.sleep(delay)
-                continue
-            except MastodonError as e:
-                log.error("Mastodon erreur API (tentative %d/%d): %s", attempt, self.max_retries, e)
-                return None
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay)
 
         log.error("Mastodon: echec apres %d tentatives.", self.max_retries)
-        return None
+        return None, None
 
-    def _favourite_status(self, status_id) -> None:
+    async def _favourite_status(self, status_id) -> None:
         """Like own post to encourage interaction."""
-        client = self._ensure_client()
-        if not client:
+        sess = await get_session()
+        if sess is None:
             return
+        url = f"{self._statuses_url}/{status_id}/favourite"
         try:
-            client.status_favourite(status_id)
+            async with sess.post(url, headers=self._auth_headers) as resp:
+                if resp.status != 200:
+                    log.warning("Mastodon: echec favori status %s: HTTP %d", status_id, resp.status)
         except Exception as e:
             log.warning("Mastodon: echec favori status %s: %s", status_id, e)
 
@@ -146,14 +199,19 @@ class MastodonPublisher:
 
             media_ids = None
             if article.image_url:
-                media = await asyncio.to_thread(self._upload_image, article.image_url)
+                media = await self._upload_image(article.image_url)
                 if media:
                     media_ids = [media["id"]]
 
-            status = await asyncio.to_thread(self._post_status, text, media_ids)
+            status, http_status = await self._post_status(
+                text, media_ids, self._idempotency_key(article)
+            )
+            # Attached (success) or possibly rejected/purged (4xx): never reuse
+            if article.image_url and (status or (http_status and 400 <= http_status < 500)):
+                self._media_cache.pop(article.image_url, None)
             if status:
                 log.info("Mastodon: publie '%s'.", article.title[:60])
-                await asyncio.to_thread(self._favourite_status, status["id"])
+                await self._favourite_status(status["id"])
                 return True
             else:
                 log.error("Mastodon: echec publication '%s'.", article.title[:60])
@@ -1,83 +1,110 @@
 import asyncio
-import json
 import html as htmlmod
 import logging
+import re
 from typing import Dict, Any, Optional
 
+from core.http import get_session
 from core.models import Article
-from core.utils import determine_importance_emoji, prettify_summary, add_utm
+from core.utils import (
+    determine_importance_emoji, prettify_summary, add_utm,
+    backoff_delay, json_dumps, json_loads, rate_limit_delay, retry_after_seconds,
+)
 
 log = logging.getLogger("bergfrid.publisher.telegram")
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_RETRY_AFTER_RE = re.compile(rb'"retry_after"\s*:\s*(\d+)')
+
+
+def _h(text: str) -> str:
+    """Escape text content for Telegram HTML; untouched when nothing needs escaping."""
+    if "&" in text or "<" in text or ">" in text:
+        return htmlmod.escape(text, quote=False)
+    return text
+
+
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+           "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _fmt_date(dt) -> str:
+    """strftime("%d %b %Y") without the libc/locale round-trip."""
+    return f"{dt.day:02d} {_MONTHS[dt.month - 1]} {dt.year}"
+
 
 class TelegramPublisher:
     name = "telegram"
 
     def __init__(self, token: str, chat_id: str, summary_max: int = 900,
-                 max_retries: int = 3, retry_base_delay: float = 5):
+                 max_retries: int = 3, retry_base_delay: float = 5,
+                 retry_max_delay: float = 30):
         self.token = token
         self.chat_id = chat_id
         self.summary_max = summary_max
         self.max_retries = max_retries
         self.retry_base_delay = retry_base_delay
-        self._session = None
-
-    async def _ensure_session(self):
-        try:
-            import aiohttp
-        except ImportError:
-            log.error("aiohttp non installe, impossible d'envoyer sur Telegram.")
-            return None
-        if self._session is None or self._session.closed:
-            timeout = aiohttp.ClientTimeout(total=20)
-            self._session = aiohttp.ClientSession(timeout=timeout)
-        return self._session
-
-    async def close(self):
-        if self._session and not self._session.closed:
-            await self._session.close()
+        self.retry_max_delay = retry_max_delay
+        api = f"https://api.telegram.org/bot{token}"
+        self._ep_message = f"{api}/sendMessage"
+        self._ep_photo = f"{api}/sendPhoto"
+        self._ep_react = f"{api}/setMessageReaction"
 
     async def _send_with_retry(self, endpoint: str, payload: dict) -> Optional[int]:
         """Send a Telegram API request with retry on 429 and 5xx.
 
         Returns the message_id on success, None on failure.
         """
-        sess = await self._ensure_session()
+        sess = await get_session()
         if sess is None:
             return None
 
+        body_bytes = json_dumps(payload)
         for attempt in range(1, self.max_retries + 1):
             try:
-                async with sess.post(endpoint, data=payload) as resp:
+                async with sess.post(endpoint, data=body_bytes, headers=_JSON_HEADERS) as resp:
                     if resp.status == 200:
                         try:
-                            data = json.loads(await resp.text())
+                            data = json_loads(await resp.read())
                             return data.get("result", {}).get("message_id")
                         except Exception:
                             return -1  # success but could not parse id
 
-                    body = await resp.text()
-
                     if resp.status == 429:
-                        try:
-                            data = json.loads(body)
-                            retry_after = data.get("parameters", {}).get("retry_after", self.retry_base_delay)
-                        except Exception:
-                            retry_after = self.retry_base_delay * attempt
+                        # Retry-After header when present, else the first bytes of
+                        # {"ok":false,"error_code":429,...,"parameters":{"retry_after":N}}
+                        server_wait = retry_after_seconds(resp.headers)
+                        if server_wait is None:
+                            m = _RETRY_AFTER_RE.search(await resp.content.read(512))
+                            server_wait = float(m.group(1)) if m else None
+                        delay = rate_limit_delay(
+                            None, attempt, self.retry_base_delay, self.retry_max_delay,
+                            server_wait=server_wait,
+                        )
+                        if delay is None:
+                            log.warning(
+                                "Telegram rate limit: retry_after=%.0fs, abandon (prochain tick).",
+                                server_wait,
+                            )
+                            return None
                         log.warning(
-                            "Telegram rate limit (429). Retry dans %ss (tentative %d/%d).",
-                            retry_after, attempt, self.max_retries,
+                            "Telegram rate limit (429). Retry dans %.1fs (tentative %d/%d).",
+                            delay, attempt, self.max_retries,
                         )
-                        await asyncio.sleep(retry_after)
+                        if attempt < self.max_retries:
+                            await asyncio.sleep(delay)
                         continue
 
+                    body = await resp.text()
+
                     if resp.status >= 500:
-                        delay = self.retry_base_delay * (2 ** (attempt - 1))
+                        delay = backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
                         log.warning(
                             "Telegram erreur serveur %d. Retry dans %.1fs (tentative %d/%d).",
                             resp.status, delay, attempt, self.max_retries,
                         )
-                        await asyncio.sleep(delay)
+                        if attempt < self.max_retries:
+                            await asyncio.sleep(delay)
                         continue
 
                     # 4xx (sauf 429) = erreur client, pas de retry
@@ -87,12 +114,12 @@ class TelegramPublisher:
             except asyncio.TimeoutError:
                 log.warning("Telegram timeout (tentative %d/%d).", attempt, self.max_retries)
                 if attempt < self.max_retries:
-                    await asyncio.sleep(self.retry_base_delay * attempt)
+                    await asyncio.sleep(backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay))
                 continue
             except Exception as e:
                 log.error("Telegram exception (tentative %d/%d): %s", attempt, self.max_retries, e)
                 if attempt < self.max_retries:
-                    await asyncio.sleep(self.retry_base_delay * attempt)
+                    await asyncio.sleep(backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay))
                 continue
 
         log.error("Telegram: echec apres %d tentatives.", self.max_retries)
@@ -102,23 +129,38 @@ class TelegramPublisher:
         """Set a reaction on a Telegram message."""
         if not message_id or message_id < 0:
             return
-        sess = await self._ensure_session()
+        sess = await get_session()
         if sess is None:
             return
-        endpoint = f"https://api.telegram.org/bot{self.token}/setMessageReaction"
         payload = {
             "chat_id": self.chat_id,
             "message_id": message_id,
-            "reaction": json.dumps([{"type": "emoji", "emoji": emoji}]),
+            "reaction": [{"type": "emoji", "emoji": emoji}],
         }
         try:
-            async with sess.post(endpoint, data=payload) as resp:
+            async with sess.post(self._ep_react, data=json_dumps(payload), headers=_JSON_HEADERS) as resp:
                 if resp.status != 200:
                     body = await resp.text()
                     log.warning("Telegram setReaction erreur %d: %s", resp.status, body[:300])
         except Exception as e:
             log.warning("Telegram setReaction exception: %s", e)
 
+    async def send_text(self, text: str, parse_mode: str = "HTML",
+                        disable_preview: bool = True, reaction: str = "") -> bool:
+        """Send a plain message (scheduled greetings/promos), optionally reacted."""
+        payload = {
+            "chat_id": self.chat_id,
+            "text": text,
+            "parse_mode": parse_mode,
+            "disable_web_page_preview": disable_preview,
+        }
+        msg_id = await self._send_with_retry(self._ep_message, payload)
+        if msg_id is None:
+            return False
+        if reaction:
+            await self.set_reaction(msg_id, reaction)
+        return True
+
     def _build_caption(self, article: Article, url: str, use_photo: bool) -> str:
         """Build message text / photo caption."""
         emoji = determine_importance_emoji(article.summary)
@@ -129,26 +171,25 @@ class TelegramPublisher:
             article.summary, max_summary, prefix="", max_paragraphs=4
         )
 
-        parts = [f"{emoji} <b>{htmlmod.escape(article.title)}</b>"]
-        parts.append("")
-        parts.append(htmlmod.escape(pretty))
-
         # Meta line: category + date
         meta_bits = []
         if article.category:
             meta_bits.append(article.category)
         if article.published_at:
-            meta_bits.append(article.published_at.strftime("%d %b %Y"))
-        if meta_bits:
-            parts.append("")
-            parts.append(f"<i>{htmlmod.escape(' \u00b7 '.join(meta_bits))}</i>")
-
-        # Hashtags
-        if article.tags:
-            parts.append("")
-            parts.append(" ".join(article.tags[:6]))
-
-        text = "\n".join(parts).strip()
+            meta_bits.append(_fmt_date(article.published_at))
+        meta_line = _h(" \u00b7 ".join(meta_bits))
+        tags_line = _h(" ".join(article.tags[:6])) if article.tags else ""
+
+        # Every block is added with its own leading separator, so the result
+        # never has surrounding whitespace to strip
+        parts = [emoji, " <b>", _h(article.title), "</b>"]
+        if pretty:
+            parts += ("\n\n", _h(pretty))
+        if meta_line:
+            parts += ("\n\n<i>", meta_line, "</i>")
+        if tags_line:
+            parts += ("\n\n", tags_line)
+        text = "".join(parts)
 
         # Telegram caption limit = 1024
         if use_photo and len(text) > 1024:
@@ -163,14 +204,14 @@ class TelegramPublisher:
             text = self._build_caption(article, url, use_photo)
 
             # Inline button "Lire l'article"
-            reply_markup = json.dumps({
+            reply_markup = {
                 "inline_keyboard": [[
                     {"text": "\U0001f4d6 Lire l'article", "url": url}
                 ]]
-            })
+            }
 
             if use_photo:
-                endpoint = f"https://api.telegram.org/bot{self.token}/sendPhoto"
+                endpoint = self._ep_photo
                 payload = {
                     "chat_id": self.chat_id,
                     "photo": article.image_url,
@@ -179,7 +220,7 @@ class TelegramPublisher:
                     "reply_markup": reply_markup,
                 }
             else:
-                endpoint = f"https://api.telegram.org/bot{self.token}/sendMessage"
+                endpoint = self._ep_message
                 payload = {
                     "chat_id": self.chat_id,
                     "text": text,
@@ -2,8 +2,18 @@ import asyncio
 import logging
 from typing import Dict, Any
 
+from core.http import get_session
 from core.models import Article
-from core.utils import determine_importance_emoji, truncate_text, add_utm
+from core.utils import determine_importance_emoji, truncate_text, add_utm, backoff_delay
+
+try:
+    import tweepy
+    from tweepy.asynchronous import AsyncClient
+except ImportError:
+    tweepy = None
+    AsyncClient = None
+except Exception:  # tweepy without its [async] extra raises TweepyException
+    AsyncClient = None
 
 log = logging.getLogger("bergfrid.publisher.twitter")
 
@@ -24,20 +34,20 @@ class TwitterPublisher:
         self.retry_base_delay = retry_base_delay
         self._client = None
 
-    def _ensure_client(self):
-        if self._client is not None:
-            return self._client
-        try:
-            import tweepy
-        except ImportError:
-            log.error("tweepy non installe. pip install tweepy")
-            return None
-        self._client = tweepy.Client(
-            consumer_key=self.api_key,
-            consumer_secret=self.api_secret,
-            access_token=self.access_token,
-            access_token_secret=self.access_secret,
-        )
+    async def _ensure_client(self):
+        if self._client is None:
+            if AsyncClient is None:
+                log.error("tweepy[async] non installe. pip install 'tweepy[async]'")
+                return None
+            self._client = AsyncClient(
+                consumer_key=self.api_key,
+                consumer_secret=self.api_secret,
+                access_token=self.access_token,
+                access_token_secret=self.access_secret,
+            )
+        # Without a session tweepy opens and closes one per request; hand it the
+        # pooled one (re-read each time in case it was recreated)
+        self._client.session = await get_session()
         return self._client
 
     def _build_tweet(self, article: Article) -> str:
@@ -59,40 +69,36 @@ class TwitterPublisher:
             text = truncate_text(text, available)
             return f"{text}\n{url}"
 
-    def _post_tweet(self, text: str) -> bool:
-        """Synchronous tweet post (called via to_thread)."""
-        client = self._ensure_client()
+    async def _post_tweet(self, text: str) -> bool:
+        """Post with retry/backoff."""
+        client = await self._ensure_client()
         if client is None:
             return False
 
-        import tweepy
-
         for attempt in range(1, self.max_retries + 1):
             try:
-                resp = client.create_tweet(text=text)
+                resp = await client.create_tweet(text=text)
                 if resp and resp.data:
                     return True
                 log.warning("Twitter: reponse inattendue: %s", resp)
                 return False
             except tweepy.TooManyRequests as e:
-                delay = self.retry_base_delay * (2 ** (attempt - 1))
+                delay = backoff_delay(attempt, self.retry_base_delay)
                 log.warning(
                     "Twitter rate limit (429). Retry dans %.1fs (tentative %d/%d).",
                     delay, attempt, self.max_retries,
                 )
                 if attempt < self.max_retries:
-                    import time
-                    time.sleep(delay)
+                    await asyncio.sleep(delay)
                 continue
             except tweepy.TwitterServerError as e:
-                delay = self.retry_base_delay * (2 ** (attempt - 1))
+                delay = backoff_delay(attempt, self.retry_base_delay)
                 log.warning(
                     "Twitter erreur serveur %s. Retry dans %.1fs (tentative %d/%d).",
                     e, delay, attempt, self.max_retries,
                 )
                 if attempt < self.max_retries:
-                    import time
-                    time.sleep(delay)
+                    await asyncio.sleep(delay)
                 continue
             except tweepy.TweepyException as e:
                 log.error("Twitter erreur API (tentative %d/%d): %s", attempt, self.max_retries, e)
@@ -104,7 +110,7 @@ class TwitterPublisher:
     async def publish(self, article: Article, cfg: Dict[str, Any]) -> bool:
         try:
             text = self._build_tweet(article)
-            ok = await asyncio.to_thread(self._post_tweet, text)
+            ok = await self._post_tweet(text)
             if ok:
                 log.info("Twitter: publie '%s'.", article.title[:60])
             else:
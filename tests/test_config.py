@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from core import config
+
+
+@pytest.fixture
+def channels_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "discord_channels.json")
+    monkeypatch.setattr(config, "DISCORD_CHANNELS_FILE", path)
+    monkeypatch.setattr(config, "_channels_cache", None)
+    return path
+
+
+class TestDiscordChannelsMap:
+    def test_missing_file_is_empty(self, channels_file):
+        assert config.load_discord_channels_map() == {}
+
+    def test_save_then_load_same_size_same_mtime(self, channels_file):
+        config.save_discord_channels_map({"1": 111})
+        st = os.stat(channels_file)
+        assert config.load_discord_channels_map() == {"1": 111}
+        config.save_discord_channels_map({"1": 222})
+        # Same size; force the old mtime to simulate coarse timestamps
+        os.utime(channels_file, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert config.load_discord_channels_map() == {"1": 222}
+
+    def test_returns_a_copy(self, channels_file):
+        config.save_discord_channels_map({"1": 111})
+        config.load_discord_channels_map()["2"] = 222
+        assert config.load_discord_channels_map() == {"1": 111}
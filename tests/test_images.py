@@ -0,0 +1,89 @@
+import io
+
+import pytest
+from core.images import shrink_image
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _jpeg(size, quality=95) -> bytes:
+    buf = io.BytesIO()
+    Image.effect_noise(size, 60).convert("RGB").save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+class TestShrinkImage:
+    def test_downscales_long_edge(self):
+        data = _jpeg((1800, 1200))
+        out, content_type = shrink_image(data, 600)
+        assert content_type == "image/jpeg"
+        assert Image.open(io.BytesIO(out)).size == (600, 400)
+        assert len(out) < len(data)
+
+    def test_respects_max_bytes(self):
+        out, _ = shrink_image(_jpeg((1600, 1600)), 1600, max_bytes=1_000_000)
+        assert len(out) <= 1_000_000
+
+    def test_small_image_returned_untouched(self):
+        buf = io.BytesIO()
+        Image.new("RGBA", (50, 50), (255, 0, 0, 128)).save(buf, "PNG")
+        data = buf.getvalue()
+        assert shrink_image(data, 600) == (data, None)
+
+    def test_garbage_returned_untouched(self):
+        assert shrink_image(b"not an image", 600) == (b"not an image", None)
+
+
+class TestImageCache:
+    def test_concurrent_callers_share_one_download(self, monkeypatch):
+        import asyncio
+        from core import image_cache
+
+        calls = []
+
+        async def fake_fetch(url, max_bytes):
+            calls.append(url)
+            await asyncio.sleep(0.01)
+            return b"img", "image/png"
+
+        monkeypatch.setattr(image_cache, "fetch_image", fake_fetch)
+        image_cache.clear()
+
+        async def run():
+            first = await asyncio.gather(*(image_cache.get_bytes("https://x/a.png") for _ in range(3)))
+            again = await image_cache.get_bytes("https://x/a.png")
+            return first, again
+
+        first, again = asyncio.run(run())
+        image_cache.clear()
+        assert calls == ["https://x/a.png"]
+        assert first == [(b"img", "image/png")] * 3
+        assert again == (b"img", "image/png")
+
+    def test_cap_is_per_caller(self, monkeypatch):
+        import asyncio
+        from core import image_cache
+
+        calls = []
+        big = b"x" * 100
+
+        async def fake_fetch(url, max_bytes):
+            calls.append(max_bytes)
+            if len(big) > max_bytes:
+                raise ValueError("image trop grosse")
+            return big, "image/jpeg"
+
+        monkeypatch.setattr(image_cache, "fetch_image", fake_fetch)
+        image_cache.clear()
+
+        async def run():
+            data, _ = await image_cache.get_bytes("https://x/big.jpg", 1000)
+            with pytest.raises(ValueError):
+                # cached body is over this caller's cap: not reused
+                await image_cache.get_bytes("https://x/big.jpg", 50)
+            return data
+
+        data = asyncio.run(run())
+        image_cache.clear()
+        assert data == big
+        assert calls == [1000, 50]
@@ -1,7 +1,10 @@
 """Tests for publisher modules (build logic only, no network calls)."""
 
+import asyncio
+import time
 import unittest
 from datetime import datetime, timezone
+from types import SimpleNamespace
 
 from core.models import Article
 
@@ -24,6 +27,53 @@ def _make_article(**overrides) -> Article:
     return Article(**defaults)
 
 
+class _FakeHttpResp:
+    def __init__(self, status, payload=None, headers=None):
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+        self.content = self
+
+    def _raw(self):
+        import json
+        return self.payload if isinstance(self.payload, bytes) else json.dumps(self.payload).encode()
+
+    async def json(self, content_type=None):
+        return self.payload
+
+    async def read(self, n=-1):
+        raw = self._raw()
+        return raw if n < 0 else raw[:n]
+
+    async def text(self):
+        return str(self.payload)
+
+
+class _FakeHttpSession:
+    """Minimal aiohttp session stand-in: each post() pops the next outcome."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.headers_seen = []
+        self.posts = []
+
+    def post(self, url, data=None, headers=None):
+        self.headers_seen.append(headers or {})
+        self.posts.append((url, data))
+        out = self.outcomes.pop(0)
+
+        class _Ctx:
+            async def __aenter__(self):
+                if isinstance(out, BaseException):
+                    raise out
+                return out
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Ctx()
+
+
 # =========================================================
 # Discord
 # =========================================================
@@ -72,6 +122,108 @@ class TestDiscordPublisher(unittest.TestCase):
         self.assertIn("#France", desc)
 
 
+def _discord_error(cls, status):
+    return cls(SimpleNamespace(status=status, reason=cls.__name__), "test")
+
+
+class _FakeDiscordMessage:
+    async def add_reaction(self, emoji):
+        pass
+
+    async def create_thread(self, name):
+        pass
+
+
+class _FakeDiscordChannel:
+    def __init__(self, tracker, error=None):
+        self.tracker = tracker
+        self.error = error
+        self.sent = 0
+
+    async def send(self, embed=None):
+        t = self.tracker
+        t["in_flight"] += 1
+        t["max_in_flight"] = max(t["max_in_flight"], t["in_flight"])
+        await asyncio.sleep(0)
+        t["in_flight"] -= 1
+        if self.error is not None:
+            raise self.error
+        self.sent += 1
+        return _FakeDiscordMessage()
+
+
+class _FakeDiscordBot:
+    def __init__(self, channels):
+        self.channels = channels
+
+    def get_channel(self, cid):
+        return self.channels.get(cid)
+
+    async def fetch_channel(self, cid):
+        import discord
+        raise _discord_error(discord.NotFound, 404)
+
+
+class TestDiscordFanOut(unittest.TestCase):
+    """publish() fan-out with a fake bot: tally, concurrency cap, cache eviction."""
+
+    def _publish(self, errors, concurrency=5):
+        from unittest import mock
+        from publishers.discord_pub import DiscordPublisher
+        tracker = {"in_flight": 0, "max_in_flight": 0}
+        channels = {cid: _FakeDiscordChannel(tracker, err) for cid, err in errors.items()}
+        pub = DiscordPublisher(_FakeDiscordBot(channels), official_channel_id=1,
+                               send_delay=0, concurrency=concurrency)
+        with mock.patch.object(pub, "_get_target_channel_ids", return_value=list(errors)):
+            ok = asyncio.run(pub.publish(_make_article(), {}))
+        return ok, pub, channels, tracker
+
+    def test_partial_failure_still_succeeds(self):
+        import discord
+        ok, pub, channels, _ = self._publish({
+            1: None,
+            2: _discord_error(discord.Forbidden, 403),
+            3: RuntimeError("boom"),
+        })
+        self.assertTrue(ok)
+        self.assertEqual(channels[1].sent, 1)
+
+    def test_all_channels_failing_returns_false(self):
+        import discord
+        ok, _, _, _ = self._publish({
+            1: _discord_error(discord.Forbidden, 403),
+            2: _discord_error(discord.HTTPException, 500),
+        })
+        self.assertFalse(ok)
+
+    def test_unresolvable_channel_counts_as_failure(self):
+        from unittest import mock
+        from publishers.discord_pub import DiscordPublisher
+        pub = DiscordPublisher(_FakeDiscordBot({}), official_channel_id=9, send_delay=0)
+        with mock.patch.object(pub, "_get_target_channel_ids", return_value=[9]):
+            self.assertFalse(asyncio.run(pub.publish(_make_article(), {})))
+
+    def test_cache_evicted_after_forbidden_and_not_found(self):
+        import discord
+        ok, pub, _, _ = self._publish({
+            1: None,
+            2: _discord_error(discord.Forbidden, 403),
+            3: _discord_error(discord.NotFound, 404),
+            4: _discord_error(discord.HTTPException, 500),
+        })
+        self.assertTrue(ok)
+        self.assertIn(1, pub._channel_cache)
+        self.assertNotIn(2, pub._channel_cache)
+        self.assertNotIn(3, pub._channel_cache)
+        # A transient HTTP error keeps the resolved channel
+        self.assertIn(4, pub._channel_cache)
+
+    def test_sends_capped_by_concurrency(self):
+        ok, _, _, tracker = self._publish({cid: None for cid in range(1, 7)}, concurrency=2)
+        self.assertTrue(ok)
+        self.assertEqual(tracker["max_in_flight"], 2)
+
+
 # =========================================================
 # Telegram
 # =========================================================
@@ -98,6 +250,20 @@ class TestTelegramPublisher(unittest.TestCase):
         text = self._build(tags=[])
         self.assertNotIn("#", text)
 
+    def test_caption_escapes_html(self):
+        text = self._build(title="R&D <secret>", tags=["#R&D"])
+        self.assertIn("R&amp;D &lt;secret&gt;", text)
+        self.assertIn("#R&amp;D", text)
+
+    def test_caption_meta_date(self):
+        text = self._build()
+        self.assertIn("<i>Geopolitique \u00b7 01 Jun 2025</i>", text)
+
+    def test_caption_no_surrounding_whitespace(self):
+        text = self._build(summary="", category="", published_at=None, tags=[])
+        self.assertEqual(text, text.strip())
+        self.assertTrue(text.endswith("</b>"))
+
     def test_caption_photo_limit(self):
         long_summary = "A" * 2000
         text = self._build(summary=long_summary)
@@ -109,6 +275,106 @@ class TestTelegramPublisher(unittest.TestCase):
         self.assertIn("Test Article Title", text)
 
 
+class TestTelegramSendWithRetry(unittest.TestCase):
+    def _send(self, outcomes, **kw):
+        from unittest import mock
+        from publishers.telegram_pub import TelegramPublisher
+        pub = TelegramPublisher(token="T", chat_id="@c", max_retries=3,
+                                retry_base_delay=0, **kw)
+        sess = _FakeHttpSession(outcomes)
+
+        async def _get_session():
+            return sess
+
+        with mock.patch("publishers.telegram_pub.get_session", _get_session):
+            mid = asyncio.run(pub._send_with_retry(pub._ep_message, {"chat_id": "@c", "text": "x"}))
+        return mid, sess
+
+    def test_short_retry_after_from_body_is_retried(self):
+        limited = _FakeHttpResp(429, {"ok": False, "error_code": 429, "parameters": {"retry_after": 0}})
+        ok = _FakeHttpResp(200, {"ok": True, "result": {"message_id": 42}})
+        mid, sess = self._send([limited, ok])
+        self.assertEqual(mid, 42)
+        self.assertEqual(len(sess.posts), 2)
+
+    def test_long_retry_after_gives_up_at_once(self):
+        limited = _FakeHttpResp(429, {"ok": False, "parameters": {"retry_after": 3600}})
+        mid, sess = self._send([limited, _FakeHttpResp(200, {"result": {"message_id": 1}})])
+        self.assertIsNone(mid)
+        self.assertEqual(len(sess.posts), 1)
+
+    def test_no_sleep_after_last_attempt(self):
+        from unittest import mock
+        limited = [_FakeHttpResp(429, {"parameters": {"retry_after": 0}}) for _ in range(3)]
+        with mock.patch("publishers.telegram_pub.asyncio.sleep", mock.AsyncMock()) as sleep:
+            mid, sess = self._send(limited)
+        self.assertIsNone(mid)
+        self.assertEqual(len(sess.posts), 3)
+        self.assertEqual(sleep.await_count, 2)
+
+
+class TestTelegramRequests(unittest.TestCase):
+    """Request shape of the JSON bodies sent to the Bot API."""
+
+    def _run(self, outcomes, coro_fn):
+        import json
+        from unittest import mock
+        from publishers.telegram_pub import TelegramPublisher
+        pub = TelegramPublisher(token="T", chat_id="@bergfrid", retry_base_delay=0)
+        sess = _FakeHttpSession(outcomes)
+
+        async def _get_session():
+            return sess
+
+        with mock.patch("publishers.telegram_pub.get_session", _get_session):
+            result = asyncio.run(coro_fn(pub))
+        bodies = [(url.rsplit("/", 1)[1], json.loads(data)) for url, data in sess.posts]
+        return result, bodies, sess
+
+    def test_send_text_payload_and_retry(self):
+        ok_resp = _FakeHttpResp(200, {"ok": True, "result": {"message_id": 7}})
+        ok, bodies, sess = self._run(
+            [_FakeHttpResp(502, "Bad Gateway"), ok_resp, _FakeHttpResp(200, {"ok": True})],
+            lambda pub: pub.send_text("<b>Bonjour</b>", reaction="\u2600"),
+        )
+        self.assertTrue(ok)
+        expected = {
+            "chat_id": "@bergfrid",
+            "text": "<b>Bonjour</b>",
+            "parse_mode": "HTML",
+            "disable_web_page_preview": True,
+        }
+        # The 502 is retried with the identical pre-encoded body
+        self.assertEqual(bodies[0], ("sendMessage", expected))
+        self.assertEqual(sess.posts[0][1], sess.posts[1][1])
+        self.assertEqual(bodies[2], ("setMessageReaction", {
+            "chat_id": "@bergfrid", "message_id": 7,
+            "reaction": [{"type": "emoji", "emoji": "\u2600"}],
+        }))
+        self.assertTrue(all(h["Content-Type"] == "application/json" for h in sess.headers_seen))
+
+    def test_send_text_client_error_returns_false(self):
+        ok, bodies, _ = self._run(
+            [_FakeHttpResp(400, "Bad Request: can't parse entities")],
+            lambda pub: pub.send_text("x", parse_mode="MarkdownV2", disable_preview=False),
+        )
+        self.assertFalse(ok)
+        self.assertEqual(len(bodies), 1)
+        self.assertEqual(bodies[0][1]["parse_mode"], "MarkdownV2")
+        self.assertIs(bodies[0][1]["disable_web_page_preview"], False)
+
+    def test_publish_sends_native_reply_markup(self):
+        ok, bodies, _ = self._run(
+            [_FakeHttpResp(200, {"result": {"message_id": 3}}), _FakeHttpResp(200, {"ok": True})],
+            lambda pub: pub.publish(_make_article(image_url=""), {}),
+        )
+        self.assertTrue(ok)
+        endpoint, body = bodies[0]
+        self.assertEqual(endpoint, "sendMessage")
+        button = body["reply_markup"]["inline_keyboard"][0][0]
+        self.assertIn("utm_source=telegram", button["url"])
+
+
 # =========================================================
 # Mastodon
 # =========================================================
@@ -150,6 +416,56 @@ class TestMastodonPublisher(unittest.TestCase):
         self.assertLessEqual(len(text), 500)
 
 
+class TestMastodonPostStatus(unittest.TestCase):
+    def _post(self, outcomes, key="k"):
+        from unittest import mock
+        from publishers.mastodon_pub import MastodonPublisher
+        pub = MastodonPublisher(instance_url="https://mastodon.social", access_token="fake",
+                                max_retries=3, retry_base_delay=0)
+        sess = _FakeHttpSession(outcomes)
+
+        async def _get_session():
+            return sess
+
+        with mock.patch("publishers.mastodon_pub.get_session", _get_session):
+            status = asyncio.run(pub._post_status("txt", None, key))
+        return status, sess
+
+    def test_retry_after_timeout_reuses_idempotency_key(self):
+        (status, http_status), sess = self._post([asyncio.TimeoutError(), _FakeHttpResp(200, {"id": "1"})])
+        self.assertEqual((status, http_status), ({"id": "1"}, 200))
+        keys = [h.get("Idempotency-Key") for h in sess.headers_seen]
+        self.assertEqual(keys, ["k", "k"])
+
+    def test_client_error_is_not_retried(self):
+        (status, http_status), sess = self._post([_FakeHttpResp(422, "Validation failed")])
+        self.assertEqual((status, http_status), (None, 422))
+        self.assertEqual(len(sess.headers_seen), 1)
+
+    def test_media_cache_dropped_on_4xx_kept_on_5xx(self):
+        from unittest import mock
+        from publishers.mastodon_pub import MastodonPublisher
+        pub = MastodonPublisher(instance_url="https://mastodon.social", access_token="fake")
+        article = _make_article()
+        media = {"id": "m1"}
+
+        async def _run(post_result):
+            pub._media_cache[article.image_url] = media
+            with mock.patch.object(pub, "_post_status", mock.AsyncMock(return_value=post_result)):
+                return await pub.publish(article, {})
+
+        self.assertFalse(asyncio.run(_run((None, 503))))
+        self.assertIs(pub._media_cache.get(article.image_url), media)
+        self.assertFalse(asyncio.run(_run((None, 422))))
+        self.assertNotIn(article.image_url, pub._media_cache)
+
+    def test_idempotency_key_is_stable_per_article(self):
+        from publishers.mastodon_pub import MastodonPublisher
+        a, b = _make_article(), _make_article(id="https://bergfrid.com/blog/other")
+        self.assertEqual(MastodonPublisher._idempotency_key(a), MastodonPublisher._idempotency_key(a))
+        self.assertNotEqual(MastodonPublisher._idempotency_key(a), MastodonPublisher._idempotency_key(b))
+
+
 # =========================================================
 # Bluesky
 # =========================================================
@@ -188,12 +504,91 @@ class TestBlueskyPublisher(unittest.TestCase):
     def test_re_login_resets_client(self):
         pub = self._pub()
         pub._client = "something"
-        pub._re_login()
+        asyncio.run(pub._re_login())
         # After re_login, _client is either None (login fails with fake creds)
         # or a new Client. Either way, the old one is gone.
         self.assertNotEqual(pub._client, "something")
 
 
+def _xrpc_error(status_code, error="", headers=None):
+    """Exception shaped like atproto's RequestException (e.response.*)."""
+    e = Exception(f"XRPC {status_code} {error}")
+    e.response = SimpleNamespace(
+        status_code=status_code,
+        content=SimpleNamespace(error=error, message=""),
+        headers=headers or {},
+    )
+    return e
+
+
+class _FakeBskyClient:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def send_post(self, text, embed=None):
+        self.calls += 1
+        out = self.outcomes.pop(0)
+        if isinstance(out, BaseException):
+            raise out
+        return out
+
+
+class TestBlueskyRetry(unittest.TestCase):
+    """_post_skeet error branching, with a fake client and no real delays."""
+
+    _OK = SimpleNamespace(uri="at://did/app.bsky.feed.post/1", cid="cid")
+
+    def _pub(self, outcomes):
+        from publishers.bluesky_pub import BlueskyPublisher
+        pub = BlueskyPublisher(handle="test.bsky.social", app_password="fake",
+                               max_retries=3, retry_base_delay=0, retry_max_delay=30)
+        pub._client = _FakeBskyClient(outcomes)
+        return pub
+
+    def test_429_is_retried(self):
+        pub = self._pub([_xrpc_error(429, "RateLimitExceeded"), self._OK])
+        self.assertIs(asyncio.run(pub._post_skeet("txt", None)), self._OK)
+        self.assertEqual(pub._client.calls, 2)
+
+    def test_503_is_retried(self):
+        pub = self._pub([_xrpc_error(503), _xrpc_error(503), self._OK])
+        self.assertIs(asyncio.run(pub._post_skeet("txt", None)), self._OK)
+        self.assertEqual(pub._client.calls, 3)
+
+    def test_expired_token_triggers_relogin(self):
+        from unittest import mock
+        pub = self._pub([_xrpc_error(400, "ExpiredToken")])
+        fresh = _FakeBskyClient([self._OK])
+
+        async def _re_login():
+            pub._client = fresh
+            return True
+
+        with mock.patch.object(pub, "_re_login", side_effect=_re_login) as relogin:
+            self.assertIs(asyncio.run(pub._post_skeet("txt", None)), self._OK)
+        relogin.assert_called_once()
+        self.assertEqual(fresh.calls, 1)
+
+    def test_404_gives_up(self):
+        pub = self._pub([_xrpc_error(404, "RecordNotFound"), self._OK])
+        self.assertIsNone(asyncio.run(pub._post_skeet("txt", None)))
+        self.assertEqual(pub._client.calls, 1)
+
+    def test_transport_timeout_is_not_resent(self):
+        e = Exception("timed out")
+        e.response = None  # atproto InvokeTimeoutError/NetworkError shape
+        pub = self._pub([e, self._OK])
+        self.assertIsNone(asyncio.run(pub._post_skeet("txt", None)))
+        self.assertEqual(pub._client.calls, 1)
+
+    def test_long_rate_limit_reset_gives_up_without_retrying(self):
+        reset = str(int(time.time()) + 600)
+        pub = self._pub([_xrpc_error(429, "RateLimitExceeded", {"ratelimit-reset": reset}), self._OK])
+        self.assertIsNone(asyncio.run(pub._post_skeet("txt", None)))
+        self.assertEqual(pub._client.calls, 1)
+
+
 # =========================================================
 # RSS image_url extraction
 # =========================================================
@@ -241,6 +636,47 @@ class TestImageUrlExtraction(unittest.TestCase):
         url = _image_url(FakeEntry(), "https://bergfrid.com")
         self.assertEqual(url, "")
 
+    def test_media_content_wins_over_thumbnail(self):
+        from core.rss import _image_url
+
+        class FakeEntry:
+            media_content = [{"url": "/a.jpg"}]
+            media_thumbnail = [{"url": "/b.jpg"}]
+            enclosures = []
+
+        self.assertEqual(_image_url(FakeEntry(), "https://bergfrid.com"), "https://bergfrid.com/a.jpg")
+
+    def test_empty_media_content_url_falls_through(self):
+        from core.rss import _image_url
+
+        class FakeEntry:
+            media_content = [{"url": ""}]
+            media_thumbnail = [{"url": "/b.jpg"}]
+            enclosures = []
+
+        self.assertEqual(_image_url(FakeEntry(), "https://bergfrid.com"), "https://bergfrid.com/b.jpg")
+
+    def test_skips_non_image_enclosure(self):
+        from core.rss import _image_url
+
+        class FakeEntry:
+            enclosures = [
+                {"href": "/podcast.mp3", "type": "audio/mpeg"},
+                {"href": "https://cdn.example.com/c.png", "type": "image/png"},
+            ]
+
+        self.assertEqual(_image_url(FakeEntry(), "https://bergfrid.com"), "https://cdn.example.com/c.png")
+
+    def test_non_list_fields_ignored(self):
+        from core.rss import _image_url
+
+        class FakeEntry:
+            media_content = {"url": "/a.jpg"}
+            media_thumbnail = "/b.jpg"
+            enclosures = [{"href": "https://cdn.example.com/c.png", "type": "image/png"}]
+
+        self.assertEqual(_image_url(FakeEntry(), "https://bergfrid.com"), "https://cdn.example.com/c.png")
+
 
 # =========================================================
 # social_summary hashtag dedup
@@ -248,20 +684,85 @@ class TestImageUrlExtraction(unittest.TestCase):
 
 class TestSocialSummaryDedup(unittest.TestCase):
     def test_strips_trailing_hashtags(self):
-        import re
+        from core.rss import _TRAILING_HASHTAGS_RE
         raw = "Some summary text\n\n#Tag1 #Tag2 #Tag3"
-        cleaned = re.sub(r'(\s*#\w+)+\s*$', '', raw).strip()
+        cleaned = _TRAILING_HASHTAGS_RE.sub('', raw).strip()
         self.assertEqual(cleaned, "Some summary text")
 
     def test_no_hashtags_unchanged(self):
-        import re
+        from core.rss import _TRAILING_HASHTAGS_RE
         raw = "Some summary text without tags"
-        cleaned = re.sub(r'(\s*#\w+)+\s*$', '', raw).strip()
+        cleaned = _TRAILING_HASHTAGS_RE.sub('', raw).strip()
         self.assertEqual(cleaned, "Some summary text without tags")
 
     def test_hashtag_in_middle_preserved(self):
-        import re
+        from core.rss import _TRAILING_HASHTAGS_RE
         raw = "The #crisis in Europe worsens"
-        cleaned = re.sub(r'(\s*#\w+)+\s*$', '', raw).strip()
+        cleaned = _TRAILING_HASHTAGS_RE.sub('', raw).strip()
         # Trailing #crisis should be stripped since it's at end? No - "worsens" follows.
         self.assertEqual(cleaned, "The #crisis in Europe worsens")
+
+
+# =========================================================
+# publish_all
+# =========================================================
+
+class TestPublishAll(unittest.TestCase):
+    def _run(self, jobs, on_result=None):
+        from publishers.base import publish_all
+        return asyncio.run(publish_all(_make_article(), jobs, on_result=on_result))
+
+    def test_runs_concurrently_and_maps_results(self):
+        in_flight = 0
+        max_in_flight = 0
+        all_started = asyncio.Event()
+
+        class _Fake:
+            def __init__(self, result):
+                self.result = result
+
+            async def publish(self, article, cfg):
+                nonlocal in_flight, max_in_flight
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+                if in_flight == 3:
+                    all_started.set()
+                # Sequential execution would never reach 3 and time out here
+                await asyncio.wait_for(all_started.wait(), timeout=5)
+                in_flight -= 1
+                if isinstance(self.result, Exception):
+                    raise self.result
+                return self.result
+
+        jobs = {
+            "discord": (_Fake(True), {}),
+            "telegram": (_Fake(False), {}),
+            "bluesky": (_Fake(RuntimeError("boom")), {}),
+        }
+        res = self._run(jobs)
+        self.assertEqual(res, {"discord": True, "telegram": False, "bluesky": False})
+        self.assertEqual(max_in_flight, 3)
+
+    def test_on_result_fires_before_slow_jobs_finish(self):
+        release_slow = asyncio.Event()
+        seen = []
+
+        class _Fast:
+            async def publish(self, article, cfg):
+                return True
+
+        class _Slow:
+            async def publish(self, article, cfg):
+                await asyncio.wait_for(release_slow.wait(), timeout=5)
+                return True
+
+        def on_result(platform, ok):
+            seen.append((platform, ok))
+            if platform == "discord":
+                # discord's result is reported while bluesky is still pending
+                self.assertEqual(seen, [("discord", True)])
+                release_slow.set()
+
+        res = self._run({"bluesky": (_Slow(), {}), "discord": (_Fast(), {})}, on_result)
+        self.assertEqual(res, {"bluesky": True, "discord": True})
+        self.assertEqual(seen, [("discord", True), ("bluesky", True)])
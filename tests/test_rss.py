@@ -1,7 +1,9 @@
 import time
 import pytest
 from types import SimpleNamespace
-from core.rss import _entry_id, _entry_html, _author, _category, _published_dt, feed_to_backlog, entry_to_article
+from core.rss import (
+    _entry_id, _entry_html, _author, _category, _published_dt, feed_to_backlog, entry_to_article,
+)
 
 
 def _make_entry(**kwargs):
@@ -159,3 +161,67 @@ class TestEntryToArticle:
         article = entry_to_article(e, "https://bergfrid.com")
         assert "#geopolitique" in article.tags
         assert "#defense" in article.tags
+
+    def test_social_summary_drops_trailing_hashtags(self):
+        e = _make_entry(description="<p>Texte du resume.</p> #defense #otan")
+        article = entry_to_article(e, "https://bergfrid.com")
+        assert article.social_summary == "Texte du resume."
+
+
+# ── parse_rss_with_cache ──────────────────────────────────────
+
+_RSS_BODY = (
+    b'<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel><title>t</title>'
+    b"<item><guid>b</guid><title>Second</title></item>"
+    b"<item><guid>a</guid><title>First</title></item>"
+    b"</channel></rss>"
+)
+
+
+class TestParseRssWithCache:
+    def _run(self, monkeypatch, state, status, body, headers):
+        import asyncio
+        from core import rss
+
+        calls = []
+
+        async def fake_fetch_feed(url, etag=None, modified=None, timeout=30):
+            calls.append((url, etag, modified))
+            return status, body, headers
+
+        monkeypatch.setattr(rss, "fetch_feed", fake_fetch_feed)
+        feed = asyncio.run(rss.parse_rss_with_cache("https://bergfrid.com/rss.xml", "https://bergfrid.com", state))
+        return feed, calls
+
+    def test_200_stores_validators(self, monkeypatch):
+        state = {}
+        feed, calls = self._run(monkeypatch, state, 200, _RSS_BODY, {
+            "Content-Type": "application/rss+xml; charset=utf-8",
+            "ETag": '"v1"',
+            "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT",
+        })
+        assert calls == [("https://bergfrid.com/rss.xml", None, None)]
+        assert feed.status == 200
+        assert [e.id for e in feed.entries] == ["b", "a"]
+        assert state == {"etag": '"v1"', "modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+
+    def test_304_sends_validators_and_returns_no_entries(self, monkeypatch):
+        state = {"etag": '"v1"', "modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+        feed, calls = self._run(monkeypatch, state, 304, b"", {})
+        assert calls == [("https://bergfrid.com/rss.xml", '"v1"', "Wed, 01 Jan 2025 00:00:00 GMT")]
+        assert feed.status == 304
+        assert feed.entries == []
+        assert state == {"etag": '"v1"', "modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+
+    def test_fetch_error_returns_empty_feed(self, monkeypatch):
+        import asyncio
+        from core import rss
+
+        async def failing_fetch_feed(url, etag=None, modified=None, timeout=30):
+            raise OSError("connexion refusee")
+
+        monkeypatch.setattr(rss, "fetch_feed", failing_fetch_feed)
+        state = {"etag": '"v1"'}
+        feed = asyncio.run(rss.parse_rss_with_cache("https://bergfrid.com/rss.xml", "https://bergfrid.com", state))
+        assert feed.entries == []
+        assert state == {"etag": '"v1"'}
@@ -1,7 +1,7 @@
 import os
 import json
 import pytest
-from core.state import StateStore
+from core.state import StateStore, SentRing
 
 
 @pytest.fixture
@@ -81,6 +81,25 @@ class TestStateStoreSave:
         store.save(state)
         assert not os.path.exists(f"{state_file}.tmp")
 
+    def test_save_batched_coalesces_until_flush(self, store, state_file):
+        state = store.load()
+        state["last_id"] = "first"
+        assert store.save_batched(state)
+        state["last_id"] = "second"
+        assert not store.save_batched(state, min_interval_s=60)
+        with open(state_file) as f:
+            assert json.load(f)["last_id"] == "first"
+        store.flush()
+        with open(state_file) as f:
+            assert json.load(f)["last_id"] == "second"
+
+    def test_load_flushes_pending_save(self, store):
+        state = store.load()
+        store.save(state)
+        state["last_id"] = "pending"
+        store.save_batched(state, min_interval_s=60)
+        assert store.load()["last_id"] == "pending"
+
 
 # ── sent_has / sent_add ───────────────────────────────────────
 
@@ -101,10 +120,40 @@ class TestSentOperations:
     def test_sent_add_no_duplicate(self, store):
         state = {"sent": {"discord": ["abc"], "telegram": []}}
         store.sent_add(state, "discord", "abc")
-        assert state["sent"]["discord"].count("abc") == 1
+        assert list(state["sent"]["discord"]).count("abc") == 1
 
     def test_sent_add_respects_ring_max(self, store):
         state = {"sent": {"discord": [f"id_{i}" for i in range(5)], "telegram": []}}
         store.sent_add(state, "discord", "new_id")
         assert len(state["sent"]["discord"]) <= 5
         assert "new_id" in state["sent"]["discord"]
+
+    def test_sent_add_evicts_oldest_from_index(self, store):
+        state = store.load()
+        for i in range(6):
+            store.sent_add(state, "discord", f"id_{i}")
+        assert state["sent"]["discord"] == [f"id_{i}" for i in range(1, 6)]
+        assert not StateStore.sent_has(state, "discord", "id_0")
+        assert StateStore.sent_has(state, "discord", "id_5")
+
+    def test_loaded_state_uses_sent_ring(self, store, state_file):
+        with open(state_file, "w") as f:
+            json.dump({"sent": {"discord": ["a", "b", "a"]}}, f)
+        state = store.load()
+        assert isinstance(state["sent"]["discord"], SentRing)
+        assert state["sent"]["discord"] == ["a", "b"]
+
+    def test_sent_ring_has_no_list_mutators(self):
+        ring = SentRing(["a"])
+        for name in ("append", "extend", "remove", "insert", "pop", "__setitem__", "__delitem__", "__iadd__"):
+            assert not hasattr(ring, name)
+
+    def test_corrupted_sent_entries_are_dropped(self, store, state_file):
+        with open(state_file, "w") as f:
+            json.dump({"sent": {"discord": ["a", ["nested"], {"x": 1}, None, "b"], "telegram": "oops"}}, f)
+        state = store.load()
+        assert state["sent"]["discord"] == ["a", "b"]
+        assert state["sent"]["telegram"] == []
+        store.save(state)
+        with open(state_file) as f:
+            assert json.load(f)["sent"]["discord"] == ["a", "b"]
@@ -1,11 +1,18 @@
 import pytest
 from core.utils import (
     truncate_text,
+    truncate_graphemes,
+    grapheme_len,
     determine_importance_emoji,
     strip_html_to_text,
     prettify_summary,
     extract_tags_from_terms,
     add_utm,
+    backoff_delay,
+    retry_after_seconds,
+    rate_limit_delay,
+    json_dumps,
+    json_loads,
 )
 
 
@@ -49,6 +56,9 @@ class TestDetermineImportanceEmoji:
     def test_case_insensitive(self):
         assert determine_importance_emoji("ALERTE MAXIMALE") == "\U0001f525"
 
+    def test_accented_keyword_case_insensitive(self):
+        assert determine_importance_emoji("Menace NUCLÉAIRE en Europe") == "\U0001f525"
+
     def test_empty_text(self):
         assert determine_importance_emoji("") == "\U0001f4f0"
 
@@ -84,6 +94,23 @@ class TestStripHtmlToText:
         result = strip_html_to_text("<p>a</p><p>b</p><p>c</p><p>d</p>")
         assert "\n\n\n" not in result
 
+    def test_selectolax_backend(self, monkeypatch):
+        pytest.importorskip("selectolax.lexbor")
+        import core.utils as utils
+        # The optional import must not silently fall back when selectolax is installed
+        assert utils.HTMLParser is not None
+        calls = []
+        real = utils.HTMLParser
+
+        def spy(html):
+            calls.append(html)
+            return real(html)
+
+        monkeypatch.setattr(utils, "HTMLParser", spy)
+        result = utils.strip_html_to_text("<p>Hello <b>world</b> &amp; co</p><p>a<br>b</p>")
+        assert len(calls) == 1
+        assert result == "Hello \nworld\n & co\na\nb"
+
 
 # ── prettify_summary ──────────────────────────────────────────
 
@@ -140,6 +167,12 @@ class TestExtractTagsFromTerms:
         result = extract_tags_from_terms(["France", "france", "FRANCE"])
         assert len(result) == 1
 
+    def test_deduplicates_casefolded(self):
+        assert extract_tags_from_terms(["Straße", "STRASSE"]) == ["#Straße"]
+
+    def test_multiword_term_joined(self):
+        assert extract_tags_from_terms(["Moyen Orient"]) == ["#MoyenOrient"]
+
     def test_empty_terms(self):
         assert extract_tags_from_terms([]) == []
 
@@ -169,3 +202,101 @@ class TestAddUtm:
     def test_empty_url_still_adds_params(self):
         result = add_utm("", "discord")
         assert "utm_source=discord" in result
+
+
+# ── backoff_delay ──────────────────────────────────────────────
+
+class TestBackoffDelay:
+    def test_within_jitter_bounds(self):
+        for attempt in (1, 2, 3):
+            for _ in range(50):
+                d = backoff_delay(attempt, 5, max_delay=1000)
+                assert 5 <= d <= 5 * 2 ** attempt
+
+    def test_capped_at_max_delay(self):
+        for _ in range(50):
+            assert backoff_delay(10, 5, max_delay=30) <= 30
+
+
+# ── retry_after_seconds ────────────────────────────────────────
+
+class TestRetryAfterSeconds:
+    def test_delta_seconds(self):
+        assert retry_after_seconds({"Retry-After": "12"}) == 12.0
+
+    def test_http_date(self):
+        from email.utils import formatdate
+        import time
+        wait = retry_after_seconds({"retry-after": formatdate(time.time() + 60, usegmt=True)})
+        assert 55 <= wait <= 61
+
+    def test_ratelimit_reset_epoch(self):
+        import time
+        wait = retry_after_seconds({"ratelimit-reset": str(int(time.time()) + 30)})
+        assert 25 <= wait <= 31
+
+    def test_mastodon_iso_reset(self):
+        from datetime import datetime, timedelta, timezone
+        reset = (datetime.now(timezone.utc) + timedelta(seconds=40)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        wait = retry_after_seconds({"X-RateLimit-Reset": reset})
+        assert 35 <= wait <= 41
+
+    def test_missing_or_garbage(self):
+        assert retry_after_seconds(None) is None
+        assert retry_after_seconds({}) is None
+        assert retry_after_seconds({"Retry-After": "soon"}) is None
+
+
+# ── truncate_graphemes ─────────────────────────────────────────
+
+class TestRateLimitDelay:
+    def test_honours_short_server_wait(self):
+        assert rate_limit_delay({"Retry-After": "20"}, 1, 1, 30) == 20.0
+
+    def test_gives_up_beyond_max_delay(self):
+        assert rate_limit_delay({"Retry-After": "600"}, 1, 1, 30) is None
+
+    def test_explicit_server_wait_wins_over_headers(self):
+        assert rate_limit_delay({"Retry-After": "600"}, 1, 1, 30, server_wait=10) == 10.0
+
+    def test_backoff_without_server_hint(self):
+        delay = rate_limit_delay({}, 2, 1, 30)
+        assert 1 <= delay <= 4
+
+
+class TestTruncateGraphemes:
+    def test_short_text_unchanged(self):
+        assert truncate_graphemes("Bonjour", 300) == "Bonjour"
+
+    def test_result_never_exceeds_limit(self):
+        text = "\U0001f1eb\U0001f1f7 " * 200
+        assert grapheme_len(truncate_graphemes(text, 300)) <= 300
+
+    def test_counts_clusters_not_code_points(self):
+        pytest.importorskip("regex")
+        flag = "\U0001f1eb\U0001f1f7"  # two code points, one grapheme
+        assert grapheme_len(flag * 10) == 10
+        # 150 flags = 300 code points but only 150 graphemes: fits untouched
+        assert truncate_graphemes(flag * 150, 200) == flag * 150
+
+    def test_does_not_split_cluster(self):
+        pytest.importorskip("regex")
+        family = "\U0001f468\u200d\U0001f469\u200d\U0001f467"
+        out = truncate_graphemes("ab" + family * 5, 6)
+        assert out == "ab" + family + "..."
+
+
+# ── json_dumps / json_loads ────────────────────────────────────
+
+class TestJsonHelpers:
+    def test_roundtrip_unicode(self):
+        obj = {"text": "Priere du jour ✝️ é", "ids": [1, 2]}
+        raw = json_dumps(obj)
+        assert isinstance(raw, bytes)
+        assert json_loads(raw) == obj
+        assert json_loads(raw.decode("utf-8")) == obj
+
+    def test_stdlib_fallback_is_compact(self, monkeypatch):
+        import core.utils as utils
+        monkeypatch.setattr(utils, "orjson", None)
+        assert utils.json_dumps({"a": [1, "é"]}) == '{"a":[1,"é"]}'.encode("utf-8")